@@ -8,10 +8,12 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from extensions import compress, csrf, limiter, login_manager, mail, migrate
 from models import User, db
+from services.json_provider import FastJSONProvider
 
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(Config)
     Config.init_app(app)
 
@@ -36,14 +38,30 @@ def create_app():
             if path.startswith("/admin") or path == "/login":
                 csrf.protect()
 
+    # --- cross-worker cache invalidation (one listener thread per forked worker) ---
+    from services.invalidation import (
+        clear_read_your_writes,
+        set_read_your_writes_cookie,
+        start_invalidation_listener,
+    )
+
+    @app.before_request
+    def ensure_invalidation_listener():
+        if not app.testing:
+            start_invalidation_listener(app)
+
+    app.after_request(set_read_your_writes_cookie)
+    app.teardown_request(clear_read_your_writes)
+
     # --- Flask-Login user loader ---
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
 
     # --- Firebase ---
-    from auth_utils import init_firebase
+    from auth_utils import forget_verified_token, init_firebase
     init_firebase()
+    app.teardown_request(forget_verified_token)
 
     # --- register blueprints ---
     from blueprints.api import api_bp
@@ -1,16 +1,110 @@
+import hashlib
 import json
 import os
+import time
 from functools import wraps
 
 import firebase_admin
 from firebase_admin import auth as firebase_auth, credentials as firebase_credentials
 from firebase_admin.auth import RevokedIdTokenError, CertificateFetchError
-from flask import g, jsonify, request
+from flask import current_app, g, jsonify, request
 
 from models import PublicUser
+from services.lru import LRUCache
+from services.redis_client import redis_delete, redis_get, redis_is_available, redis_set
 
 firebase_app = None
 
+# Verified ID tokens, keyed by sha256(token): {"claims": ..., "checked_at": unix time of the
+# last revocation check}. Shared through Redis; process-local when it is unavailable.
+TOKEN_CACHE_PREFIX = "taraweeh:idtoken:"
+TOKEN_EXPIRY_MARGIN = 30  # seconds; stop serving a token's claims this long before its exp
+_local_tokens = LRUCache(maxsize=4096)
+
+
+def bearer_token():
+    """The bearer token from the Authorization header, or None."""
+    auth_header = request.headers.get("Authorization", "")
+    return auth_header[7:] if auth_header.startswith("Bearer ") else None
+
+
+def _token_key(token):
+    return TOKEN_CACHE_PREFIX + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cached_token(key):
+    if redis_is_available():
+        return redis_get(key)
+    return _local_tokens.get(key)
+
+
+def _store_token(key, claims):
+    ttl = int(claims.get("exp", 0) - time.time() - TOKEN_EXPIRY_MARGIN)
+    if ttl <= 0:
+        return
+    entry = {"claims": claims, "checked_at": time.time()}
+    if redis_is_available():
+        redis_set(key, entry, ttl=ttl)
+    else:
+        _local_tokens.set(key, entry, ttl=ttl)
+
+
+def _forget_token(key):
+    redis_delete(key)
+    _local_tokens.pop(key)
+
+
+def _verify_token(token):
+    """verify_id_token(token, check_revoked=True), answered from the token cache when possible.
+
+    A cached token is trusted until TOKEN_EXPIRY_MARGIN seconds before its
+    exp; its revocation is re-checked with Firebase at most every
+    FIREBASE_REVOCATION_CHECK_INTERVAL seconds. Failures are never cached.
+    """
+    key = _token_key(token)
+    entry = _cached_token(key)
+    now = time.time()
+    if entry is not None and entry["claims"].get("exp", 0) - TOKEN_EXPIRY_MARGIN > now:
+        interval = current_app.config.get("FIREBASE_REVOCATION_CHECK_INTERVAL", 300)
+        if now - entry["checked_at"] < interval:
+            return entry["claims"]
+    try:
+        claims = firebase_auth.verify_id_token(token, check_revoked=True)
+    except CertificateFetchError:
+        raise  # Firebase unreachable says nothing about the token; keep its entry
+    except Exception:
+        if entry is not None:
+            _forget_token(key)
+        raise
+    _store_token(key, claims)
+    return claims
+
+
+def verify_request_token(token):
+    """Verify a Firebase ID token (with revocation), at most once per request.
+
+    The outcome (decoded claims or the exception) is memoized on g, so a
+    conditional-GET check and the auth decorator share one verification.
+    Across requests, verified tokens come from the token cache.
+    """
+    cached = g.get("_verified_token")
+    if cached is not None and cached[0] == token:
+        if isinstance(cached[1], Exception):
+            raise cached[1]
+        return cached[1]
+    try:
+        decoded = _verify_token(token)
+    except Exception as e:
+        g._verified_token = (token, e)
+        raise
+    g._verified_token = (token, decoded)
+    return decoded
+
+
+def forget_verified_token(exc=None):
+    """teardown_request hook: a verification only counts for the request that made it."""
+    g.pop("_verified_token", None)
+
 
 def init_firebase():
     """Initialize Firebase Admin SDK. Call once at app startup."""
@@ -40,7 +134,7 @@ def firebase_auth_required(f):
             return jsonify({"error": "Missing or invalid token"}), 401
         token = auth_header[7:]
         try:
-            decoded = firebase_auth.verify_id_token(token, check_revoked=True)
+            decoded = verify_request_token(token)
         except RevokedIdTokenError:
             return jsonify({"error": "Token revoked, please re-authenticate"}), 401
         except CertificateFetchError:
@@ -63,7 +157,7 @@ def firebase_auth_optional(f):
         auth_header = request.headers.get("Authorization", "")
         if auth_header.startswith("Bearer ") and firebase_app:
             try:
-                decoded = firebase_auth.verify_id_token(auth_header[7:], check_revoked=True)
+                decoded = verify_request_token(auth_header[7:])
                 g.firebase_decoded = decoded
                 g.current_public_user = PublicUser.query.filter_by(firebase_uid=decoded["uid"]).first()
             except Exception:
@@ -83,7 +177,7 @@ def admin_or_moderator_required(f):
             return jsonify({"error": "Missing or invalid token"}), 401
         token = auth_header[7:]
         try:
-            decoded = firebase_auth.verify_id_token(token, check_revoked=True)
+            decoded = verify_request_token(token)
         except RevokedIdTokenError:
             return jsonify({"error": "Token revoked"}), 401
         except CertificateFetchError:
@@ -1,4 +1,4 @@
-"""Admin API routes: /api/admin/stats, mosques, imams, users, audio"""
+"""Admin API routes: /api/admin/stats, cache stats, mosques, imams, users, audio"""
 
 import os
 import re
@@ -12,7 +12,9 @@ from flask import Blueprint, jsonify, request, send_from_directory, g
 from auth_utils import admin_or_moderator_required
 from extensions import limiter
 from models import CommunityRequest, Imam, Mosque, PublicUser, TaraweehAttendance, UserFavorite, db
-from services.cache import invalidate_caches
+from services.cache import cache_stats, invalidate_written, search_result_cache
+from services.cache_tags import user_tags
+from services.redis_client import redis_breaker_state
 from utils import normalize_arabic
 
 admin_bp = Blueprint("admin_api", __name__)
@@ -35,6 +37,17 @@ def admin_stats():
     })
 
 
+@admin_bp.route("/api/admin/cache/stats")
+@admin_or_moderator_required
+def admin_cache_stats():
+    """This worker's response-cache counters and Redis breaker (each gunicorn worker keeps its own)."""
+    return jsonify({
+        "responses": cache_stats(),
+        "search_results": search_result_cache.stats(),
+        "redis": redis_breaker_state(),
+    })
+
+
 @admin_bp.route("/api/admin/mosques")
 @admin_or_moderator_required
 def admin_list_mosques():
@@ -135,7 +148,7 @@ def admin_create_mosque():
         )
         db.session.add(imam)
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"id": mosque.id}), 201
 
 
@@ -190,7 +203,7 @@ def admin_update_mosque(mosque_id):
         if current_imam and "youtube_link" in data:
             current_imam.youtube_link = data["youtube_link"].strip() or None
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"success": True})
 
 
@@ -200,12 +213,17 @@ def admin_delete_mosque(mosque_id):
     mosque = Mosque.query.get(mosque_id)
     if not mosque:
         return jsonify({"error": "غير موجود"}), 404
+    # Bulk updates bypass the cache tag collector: name what they touch up front
+    imam_ids = [i for (i,) in db.session.query(Imam.id).filter_by(mosque_id=mosque.id)]
+    user_ids = {u for (u,) in db.session.query(UserFavorite.user_id).filter_by(mosque_id=mosque.id)}
+    user_ids.update(u for (u,) in db.session.query(TaraweehAttendance.user_id).filter_by(mosque_id=mosque.id))
+    users = PublicUser.query.filter(PublicUser.id.in_(user_ids)).all() if user_ids else []
     Imam.query.filter_by(mosque_id=mosque.id).update({"mosque_id": None})
     UserFavorite.query.filter_by(mosque_id=mosque.id).delete()
     TaraweehAttendance.query.filter_by(mosque_id=mosque.id).update({"mosque_id": None})
     db.session.delete(mosque)
     db.session.commit()
-    invalidate_caches()
+    invalidate_written(*(f"imam:{i}" for i in imam_ids), *(tag for user in users for tag in user_tags(user)))
     return jsonify({"success": True})
 
 
@@ -264,7 +282,7 @@ def admin_create_imam():
     )
     db.session.add(imam)
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"id": imam.id}), 201
 
 
@@ -284,7 +302,7 @@ def admin_update_imam(imam_id):
     if "youtube_link" in data:
         imam.youtube_link = data["youtube_link"].strip() or None
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"success": True})
 
 
@@ -296,7 +314,7 @@ def admin_delete_imam(imam_id):
         return jsonify({"error": "غير موجود"}), 404
     db.session.delete(imam)
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"success": True})
 
 
@@ -346,7 +364,7 @@ def admin_update_user_role(user_id):
         return jsonify({"error": "الدور غير صالح"}), 400
     user.role = new_role
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"success": True})
 
 
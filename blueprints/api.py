@@ -1,34 +1,81 @@
-"""Public API routes: /api/mosques, /api/locations, /api/areas, /api/leaderboard, /sitemap.xml, /api/mosques/nearby"""
+"""Public API routes: /api/mosques, /api/facets, /api/locations, /api/areas, /api/leaderboard, /sitemap.xml (+ shards), /api/mosques/nearby"""
 
-import time
-
-from flask import Blueprint, jsonify, make_response, render_template, request
-from geopy.distance import geodesic
+from flask import Blueprint, abort, g, jsonify, request
 
+from auth_utils import firebase_auth_required
 from extensions import limiter
-from models import CommunityRequest, Imam, ImamTransferRequest, Mosque, PublicUser, db
-from services.cache import cache_get, cache_set
-from services.serializers import serialize_mosque
+from models import PublicUser
+from services.cache import (
+    CachedPayload, cache_fetch, cache_fetch_payload, cached_response, search_result_cache,
+)
+from services.catalog import get_catalog
+from services.conditional import conditional_get
+from services.facets import get_facets
+from services.leaderboard import around, current_season, pioneer_id, top
+from services.mosque_search import get_mosque_search_index
+from services.nearby import find_nearby
+from services.serializers import (
+    encode_cursor, parse_fields, parse_ids, parse_page, serialize_listing, serialize_mosque,
+)
+from services.sitemap import (
+    iter_sitemap_index, iter_urlset, render as render_sitemap, shard_count, shard_urls, sitemap_urls,
+)
 from utils import normalize_arabic
 
 api_bp = Blueprint("api", __name__)
 
 
+def _listing_args():
+    """(fields, page) from the projection/pagination query args. Raises ValueError."""
+    return parse_fields(request.args.get("fields", "")), parse_page(request.args)
+
+
+def _listing_key(fields, page):
+    fields_part = ",".join(fields) if fields else "*"
+    page_part = f"{encode_cursor(*page[0]) if page[0] else ''}+{page[1]}" if page else "all"
+    return f"{fields_part}:{page_part}"
+
+
 @api_bp.route("/api/mosques")
 def get_mosques():
     try:
-        cached = cache_get("mosques")
-        if cached is not None:
-            return jsonify(cached)
-        pairs = (
-            db.session.query(Mosque, Imam)
-            .outerjoin(Imam, Imam.mosque_id == Mosque.id)
-            .order_by(Mosque.name)
-            .all()
+        fields, page = _listing_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if page is not None:
+            # Cursors are client-chosen keys: pages are cut from the snapshot per request, never cached
+            payload = CachedPayload.from_value(
+                serialize_listing(get_catalog().rows, fields, page), precompress=False
+            )
+            return cached_response(payload)
+        cache_key = "mosques" if fields is None else f"mosques:{_listing_key(fields, None)}"
+        payload = cache_fetch(
+            cache_key, lambda: serialize_listing(get_catalog().rows, fields), tags=("mosques",)
         )
-        result = [serialize_mosque(m, imam=i) for m, i in pairs]
-        cache_set("mosques", result)
-        return jsonify(result)
+        return cached_response(payload)
+    except Exception as e:
+        return jsonify({"error": "حدث خطأ في الخادم"}), 500
+
+
+@api_bp.route("/api/mosques/batch")
+def get_mosques_batch():
+    try:
+        ids = parse_ids(request.args.get("ids", ""))
+        fields = parse_fields(request.args.get("fields", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        catalog = get_catalog()
+        items, missing = [], []
+        for mosque_id in ids:
+            row = catalog.mosque_row(mosque_id)
+            if row is None:
+                missing.append(mosque_id)
+                continue
+            mosque, imam = row
+            items.append(serialize_mosque(mosque, imam=imam, fields=fields))
+        return jsonify({"items": items, "missing": missing})
     except Exception as e:
         return jsonify({"error": "حدث خطأ في الخادم"}), 500
 
@@ -36,10 +83,11 @@ def get_mosques():
 @api_bp.route("/api/mosques/<int:mosque_id>")
 def get_mosque(mosque_id):
     try:
-        mosque = Mosque.query.get(mosque_id)
-        if not mosque:
+        row = get_catalog().mosque_row(mosque_id)
+        if not row:
             return jsonify({"error": "Mosque not found"}), 404
-        return jsonify(serialize_mosque(mosque))
+        mosque, imam = row
+        return jsonify(serialize_mosque(mosque, imam=imam))
     except Exception as e:
         return jsonify({"error": "حدث خطأ في الخادم"}), 500
 
@@ -47,44 +95,46 @@ def get_mosque(mosque_id):
 @api_bp.route("/api/mosques/search")
 @limiter.limit("30 per minute")
 def search_mosques():
+    try:
+        fields, page = _listing_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         query = request.args.get("q", "")
         area = request.args.get("area", "")
         location = request.args.get("location", "")
 
-        mosque_query = (
-            db.session.query(Mosque, Imam)
-            .outerjoin(Imam, Imam.mosque_id == Mosque.id)
+        catalog = get_catalog()
+        cache_key = (
+            "mosques",
+            catalog.version,
+            normalize_arabic(query),
+            area if area != "الكل" else "",
+            location if location != "الكل" else "",
+            _listing_key(fields, page),
         )
-        if area and area != "الكل":
-            mosque_query = mosque_query.filter(Mosque.area == area)
-        if location and location != "الكل":
-            mosque_query = mosque_query.filter(Mosque.location == location)
-        mosque_query = mosque_query.order_by(Mosque.name)
-        pairs = mosque_query.all()
-
-        if query:
-            normalized_query = normalize_arabic(query)
-            filtered_pairs = []
-            for mosque, imam in pairs:
-                imam_name = imam.name if imam else ""
-                if (
-                    query.lower() in mosque.name.lower()
-                    or query.lower() in mosque.location.lower()
-                    or query.lower() in imam_name.lower()
-                    or normalized_query in normalize_arabic(mosque.name)
-                    or normalized_query in normalize_arabic(mosque.location)
-                    or (imam_name and normalized_query in normalize_arabic(imam_name))
-                ):
-                    filtered_pairs.append((mosque, imam))
-            pairs = filtered_pairs
-
-        result = [serialize_mosque(m, imam=i) for m, i in pairs]
-        return jsonify(result)
+        payload = search_result_cache.get(cache_key)
+        if payload is None:
+            pairs = get_mosque_search_index().search(query, area=area, location=location)
+            payload = CachedPayload.from_value(serialize_listing(pairs, fields, page), precompress=False)
+            search_result_cache.set(cache_key, payload)
+        return cached_response(payload)
     except Exception as e:
         return jsonify({"error": "حدث خطأ في البحث"}), 500
 
 
+def _areas_payload():
+    return cache_fetch("areas", lambda: get_facets().areas(), tags=("mosques",))
+
+
+@api_bp.route("/api/facets")
+def get_facets_tree():
+    try:
+        return cached_response(cache_fetch("facets", lambda: get_facets().as_payload(), tags=("mosques",)))
+    except Exception as e:
+        return jsonify({"error": "حدث خطأ في الخادم"}), 500
+
+
 @api_bp.route("/api/locations")
 def get_locations():
     try:
@@ -92,24 +142,13 @@ def get_locations():
         areas_only = request.args.get("areas_only", "")
 
         if areas_only == "1":
-            cached = cache_get("areas")
-            if cached is not None:
-                return jsonify(cached)
-            query = db.session.query(Mosque.area).distinct()
-            areas = sorted([row[0] for row in query.all() if row[0]])
-            cache_set("areas", areas)
-            return jsonify(areas)
-
-        cache_key = f"locations:{area}" if area and area != "الكل" else "locations:"
-        cached = cache_get(cache_key)
-        if cached is not None:
-            return jsonify(cached)
-        query = db.session.query(Mosque.location).distinct()
+            return cached_response(_areas_payload())
+
         if area and area != "الكل":
-            query = query.filter(Mosque.area == area)
-        locations = sorted([row[0] for row in query.all() if row[0]])
-        cache_set(cache_key, locations)
-        return jsonify(locations)
+            cache_key, tags = f"locations:{area}", (f"area:{area}",)
+        else:
+            cache_key, tags = "locations:", ("mosques",)
+        return cached_response(cache_fetch(cache_key, lambda: get_facets().locations(area), tags))
     except Exception as e:
         return jsonify({"error": "حدث خطأ في الخادم"}), 500
 
@@ -117,9 +156,7 @@ def get_locations():
 @api_bp.route("/api/areas")
 def get_areas():
     try:
-        query = db.session.query(Mosque.area).distinct()
-        areas = sorted([row[0] for row in query.all() if row[0]])
-        return jsonify(areas)
+        return cached_response(_areas_payload())
     except Exception as e:
         return jsonify({"error": "حدث خطأ في الخادم"}), 500
 
@@ -127,71 +164,122 @@ def get_areas():
 @api_bp.route("/api/mosques/nearby")
 @limiter.limit("20 per minute")
 def nearby_mosques():
-    start = time.time()
     try:
         lat = request.args.get("lat", type=float)
         lng = request.args.get("lng", type=float)
         if not lat or not lng:
             return jsonify({"error": "Latitude and longitude are required"}), 400
+        limit = request.args.get("limit", type=int)
+        radius_km = request.args.get("radius_km", type=float)
+        if limit is not None and limit < 1:
+            return jsonify({"error": "limit must be a positive integer"}), 400
+        if radius_km is not None and radius_km <= 0:
+            return jsonify({"error": "radius_km must be positive"}), 400
+        has_audio = request.args.get("has_audio", "") in ("1", "true")
 
-        pairs = (
-            db.session.query(Mosque, Imam)
-            .outerjoin(Imam, Imam.mosque_id == Mosque.id)
-            .filter(Mosque.latitude.isnot(None), Mosque.longitude.isnot(None))
-            .all()
+        result = find_nearby(
+            lat, lng,
+            limit=limit,
+            radius_km=radius_km,
+            area=request.args.get("area", ""),
+            has_audio=has_audio,
         )
-        user_location = (lat, lng)
-        result = []
-        for mosque, imam in pairs:
-            mosque_location = (mosque.latitude, mosque.longitude)
-            distance = geodesic(user_location, mosque_location).kilometers
-            result.append(serialize_mosque(mosque, imam=imam, distance=round(distance, 2)))
-        result.sort(key=lambda x: x["distance"])
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": "حدث خطأ في حساب المسافة"}), 500
 
 
+def _leaderboard_entries(rows, pioneer, ranks=None):
+    """Hydrate [(user_id, points)] board rows with public profile fields (one PK lookup).
+
+    Rows whose user no longer exists are dropped; pass `ranks` (parallel to
+    `rows`) to carry each row's rank onto its entry.
+    """
+    ids = [uid for uid, _ in rows]
+    users = {u.id: u for u in PublicUser.query.filter(PublicUser.id.in_(ids)).all()} if ids else {}
+    entries = []
+    for i, (uid, points) in enumerate(rows):
+        user = users.get(uid)
+        if user is None:
+            continue
+        entry = {
+            "username": user.username,
+            "display_name": user.display_name,
+            "avatar_url": user.avatar_url,
+            "points": points,
+            "is_pioneer": uid == pioneer,
+        }
+        if ranks is not None:
+            entry["rank"] = ranks[i]
+        entries.append(entry)
+    return entries
+
+
+def _leaderboard_season():
+    """Season from ?season= ("" = all-time, "current", or a year). Raises ValueError."""
+    season = request.args.get("season", "").strip()
+    if season == "current":
+        return current_season()
+    if season and not (season.isdigit() and len(season) == 4):
+        raise ValueError("Invalid season")
+    return season or None
+
+
 @api_bp.route("/api/leaderboard")
+@conditional_get(lambda: ("leaderboard", f"season:{current_season()}"))
 def leaderboard():
-    users = PublicUser.query.filter(
-        PublicUser.contribution_points > 0
-    ).order_by(
-        PublicUser.contribution_points.desc()
-    ).limit(20).all()
-    # Check both legacy transfers and community requests for first pioneer
-    legacy_pioneer = db.session.query(
-        ImamTransferRequest.submitter_id, ImamTransferRequest.reviewed_at
-    ).filter(
-        ImamTransferRequest.status == "approved"
-    ).order_by(ImamTransferRequest.reviewed_at.asc()).first()
-
-    community_pioneer = db.session.query(
-        CommunityRequest.submitter_id, CommunityRequest.reviewed_at
-    ).filter(
-        CommunityRequest.status == "approved"
-    ).order_by(CommunityRequest.reviewed_at.asc()).first()
-
-    pioneer_id = None
-    if legacy_pioneer and community_pioneer:
-        pioneer_id = legacy_pioneer[0] if legacy_pioneer[1] <= community_pioneer[1] else community_pioneer[0]
-    elif legacy_pioneer:
-        pioneer_id = legacy_pioneer[0]
-    elif community_pioneer:
-        pioneer_id = community_pioneer[0]
-    return jsonify([{
-        "username": u.username,
-        "display_name": u.display_name,
-        "avatar_url": u.avatar_url,
-        "points": u.contribution_points,
-        "is_pioneer": u.id == pioneer_id,
-    } for u in users])
+    try:
+        season = _leaderboard_season()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = min(100, max(1, request.args.get("per_page", 20, type=int)))
+    rows = top((page - 1) * per_page, per_page, season=season)
+    return jsonify(_leaderboard_entries(rows, pioneer_id()))
+
+
+@api_bp.route("/api/leaderboard/me")
+@firebase_auth_required
+def leaderboard_me():
+    user = g.current_public_user
+    if not user:
+        return jsonify({"error": "Not registered"}), 401
+    try:
+        season = _leaderboard_season()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    mine, neighbours = around(user.id, season=season)
+    pioneer = pioneer_id()
+    entries = _leaderboard_entries(
+        [(uid, points) for _, uid, points in neighbours], pioneer,
+        ranks=[rank for rank, _, _ in neighbours],
+    )
+    return jsonify({
+        "rank": mine[0] if mine else None,
+        "points": mine[1] if mine else 0,
+        "neighbours": entries,
+    })
+
+
+def _sitemap_payload(cache_key, chunks):
+    payload = cache_fetch_payload(
+        cache_key, lambda: CachedPayload(render_sitemap(chunks()), mimetype="application/xml"),
+        tags=("mosques",),
+    )
+    return cached_response(payload)
 
 
 @api_bp.route("/sitemap.xml")
 def sitemap():
-    mosques = Mosque.query.all()
-    sitemap_xml = render_template("sitemap.xml", mosques=mosques)
-    response = make_response(sitemap_xml)
-    response.headers["Content-Type"] = "application/xml"
-    return response
+    urls = get_catalog().derived("sitemap_urls", sitemap_urls)
+    if shard_count(urls):
+        return _sitemap_payload("sitemap", lambda: iter_sitemap_index(urls))
+    return _sitemap_payload("sitemap", lambda: iter_urlset(urls))
+
+
+@api_bp.route("/sitemap-<int:shard>.xml")
+def sitemap_shard(shard):
+    urls = shard_urls(get_catalog().derived("sitemap_urls", sitemap_urls), shard)
+    if urls is None:
+        abort(404)
+    return _sitemap_payload(f"sitemap:{shard}", lambda: iter_urlset(urls))
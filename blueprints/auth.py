@@ -4,7 +4,11 @@ from flask import Blueprint, jsonify, request, g
 
 from auth_utils import firebase_auth_required, firebase_auth_optional
 from extensions import limiter
-from models import Imam, Mosque, PublicUser, TaraweehAttendance, UserFavorite, db
+from models import Mosque, PublicUser, TaraweehAttendance, UserFavorite, db
+from services.cache import invalidate_written
+from services.cache_tags import user_tags
+from services.catalog import get_catalog
+from services.conditional import conditional_get
 from services.serializers import serialize_mosque
 from services.validation import sanitize_text, validate_username
 
@@ -45,6 +49,7 @@ def register_user():
                 db.session.add(UserFavorite(user_id=user.id, mosque_id=mosque_id))
 
     db.session.commit()
+    invalidate_written(*user_tags(user))
     return jsonify({
         "id": user.id,
         "username": user.username,
@@ -94,6 +99,7 @@ def mark_milestone(milestone):
 
 # --- user favorites routes ---
 @auth_bp.route("/api/user/favorites")
+@conditional_get(lambda uid: (f"uid:{uid}",), private=True)
 @firebase_auth_required
 def get_favorites():
     user = g.current_public_user
@@ -118,6 +124,7 @@ def bulk_set_favorites():
         if mid in valid_ids:
             db.session.add(UserFavorite(user_id=user.id, mosque_id=mid))
     db.session.commit()
+    invalidate_written(*user_tags(user))
     return jsonify(list(valid_ids))
 
 
@@ -134,6 +141,7 @@ def add_favorite(mosque_id):
     if not existing:
         db.session.add(UserFavorite(user_id=user.id, mosque_id=mosque_id))
         db.session.commit()
+        invalidate_written(*user_tags(user))
     return jsonify({"success": True})
 
 
@@ -147,24 +155,24 @@ def remove_favorite(mosque_id):
     if fav:
         db.session.delete(fav)
         db.session.commit()
+        invalidate_written(*user_tags(user))
     return jsonify({"success": True})
 
 
 # --- public profile routes ---
 @auth_bp.route("/api/u/<username>")
+@conditional_get(lambda username: ("mosques", f"username:{username}"))
 def public_profile(username):
     user = PublicUser.query.filter_by(username=username).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
-    fav_mosque_ids = [fav.mosque_id for fav in user.favorites]
+    fav_mosque_ids = {fav.mosque_id for fav in user.favorites}
     if fav_mosque_ids:
-        pairs = (
-            db.session.query(Mosque, Imam)
-            .outerjoin(Imam, Imam.mosque_id == Mosque.id)
-            .filter(Mosque.id.in_(fav_mosque_ids))
-            .all()
-        )
-        mosques = [serialize_mosque(m, imam=i) for m, i in pairs]
+        mosques = [
+            serialize_mosque(m, imam=i)
+            for m, i in get_catalog().rows
+            if m.id in fav_mosque_ids
+        ]
     else:
         mosques = []
     return jsonify({
@@ -200,6 +208,7 @@ def _compute_streaks(nights_set):
 
 
 @auth_bp.route("/api/user/tracker")
+@conditional_get(lambda uid: (f"uid:{uid}",), private=True)
 @firebase_auth_required
 def get_tracker():
     user = g.current_public_user
@@ -240,6 +249,7 @@ def mark_night(night):
     else:
         db.session.add(TaraweehAttendance(user_id=user.id, night=night, mosque_id=mosque_id, rakaat=rakaat))
     db.session.commit()
+    invalidate_written(*user_tags(user))
     return jsonify({"success": True})
 
 
@@ -253,10 +263,12 @@ def unmark_night(night):
     if record:
         db.session.delete(record)
         db.session.commit()
+        invalidate_written(*user_tags(user))
     return jsonify({"success": True})
 
 
 @auth_bp.route("/api/u/<username>/tracker")
+@conditional_get(lambda username: (f"username:{username}",))
 def public_tracker(username):
     user = PublicUser.query.filter_by(username=username).first()
     if not user:
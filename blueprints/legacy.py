@@ -14,7 +14,8 @@ from wtforms_sqlalchemy.fields import QuerySelectField
 from extensions import limiter
 from models import Imam, ImamTransferRequest, Mosque, PublicUser, User, db
 from services.audio import upload_audio_to_s3
-from services.cache import invalidate_caches
+from services.cache import invalidate_written
+from services.leaderboard import award_points
 
 import datetime
 
@@ -105,7 +106,7 @@ def swap_imam_view(mosque_id):
                 db.session.add(new_imam)
 
         db.session.commit()
-        invalidate_caches()
+        invalidate_written()
         return redirect(url_for("mosque.index_view"))
 
     mosques = Mosque.query.order_by(Mosque.name).all()
@@ -213,7 +214,7 @@ class MosqueModelView(BaseModelView):
         elif imam and not imam_name:
             imam.mosque_id = None
             db.session.commit()
-        invalidate_caches()
+        invalidate_written()
 
     @action("swap_imam", "تبديل الإمام", "هل تريد تبديل إمام المسجد المحدد؟")
     def swap_imam_action(self, ids):
@@ -269,6 +270,7 @@ class TransferRequestModelView(BaseModelView):
 
     @action("approve", "قبول البلاغات المحددة", "هل تريد قبول البلاغات المحددة؟")
     def action_approve(self, ids):
+        awarded = []
         for transfer_id in ids:
             tr = ImamTransferRequest.query.get(transfer_id)
             if not tr or tr.status != "pending":
@@ -292,11 +294,14 @@ class TransferRequestModelView(BaseModelView):
                     db.text("UPDATE public_user SET contribution_points = contribution_points + 1 WHERE id = :uid"),
                     {"uid": submitter.id}
                 )
+                awarded.append(submitter.id)
             tr.status = "approved"
             tr.reviewed_at = datetime.datetime.utcnow()
             tr.reviewed_by = current_user.id if current_user.is_authenticated else None
         db.session.commit()
-        invalidate_caches()
+        invalidate_written()
+        for user_id in awarded:
+            award_points(user_id)
 
     @action("reject", "رفض البلاغات المحددة", "هل تريد رفض البلاغات المحددة؟")
     def action_reject(self, ids):
@@ -7,7 +7,9 @@ from flask import Blueprint, jsonify, request, g
 from auth_utils import firebase_auth_required, admin_or_moderator_required
 from extensions import limiter
 from models import CommunityRequest, Imam, Mosque, PublicUser, db
-from services.cache import invalidate_caches
+from services.cache import invalidate_written
+from services.catalog import get_catalog
+from services.leaderboard import award_points
 from services.validation import is_arabic_text, sanitize_text
 from utils import normalize_arabic
 
@@ -190,22 +192,24 @@ def check_duplicate_request():
 
     normalized_query = normalize_arabic(query_str)
     matches = []
+    # Catalog names are normalized through the memo, so repeat checks never re-normalize
+    catalog = get_catalog()
     if check_type == "mosque":
-        all_mosques = Mosque.query.all()
-        for m in all_mosques:
+        for mosque_id in sorted(catalog.mosques):
+            m = catalog.mosques[mosque_id]
             if normalized_query in normalize_arabic(m.name):
                 matches.append({"id": m.id, "name": m.name, "area": m.area, "location": m.location})
                 if len(matches) >= 5:
                     break
     elif check_type == "imam":
-        all_imams = Imam.query.all()
-        for i in all_imams:
+        for i in catalog.imams.values():
             if normalized_query in normalize_arabic(i.name):
+                mosque = catalog.mosques.get(i.mosque_id)
                 matches.append({
                     "id": i.id,
                     "name": i.name,
                     "mosque_id": i.mosque_id,
-                    "mosque_name": i.mosque.name if i.mosque else None,
+                    "mosque_name": mosque.name if mosque else None,
                 })
                 if len(matches) >= 5:
                     break
@@ -434,7 +438,9 @@ def admin_approve_request(request_id):
     cr.reviewed_at = datetime.datetime.utcnow()
     cr.reviewed_by = g.current_public_user.id
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
+    if submitter:
+        award_points(submitter.id)
     return jsonify({"success": True})
 
 
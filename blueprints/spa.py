@@ -6,11 +6,13 @@ import os
 import re
 from html import escape as html_escape
 
-from flask import Blueprint, jsonify, make_response, redirect, render_template, request, send_from_directory
+from flask import Blueprint, abort, jsonify, make_response, redirect, render_template, request, send_from_directory
 from flask_mail import Message
 
 from extensions import limiter, mail
-from models import Imam, Mosque, PublicUser, db
+from models import Mosque, PublicUser
+from services.cache import CachedPayload, cache_fetch_payload, cached_response
+from services.catalog import get_catalog
 
 spa_bp = Blueprint("spa", __name__)
 
@@ -78,16 +80,30 @@ def inject_meta_tags(html, meta):
     return html
 
 
-def serve_react_app(meta_tags=None):
-    """Serve the React SPA index.html for client-side routing."""
+def _get_react_payload():
+    """The untouched React index.html as a precompressed payload (built once per process)."""
+    if not hasattr(_get_react_payload, "_cache"):
+        _get_react_payload._cache = CachedPayload(_get_react_html().encode("utf-8"), mimetype="text/html")
+    return _get_react_payload._cache
+
+
+def serve_react_app(meta_tags=None, tags=()):
+    """Serve the React SPA index.html for client-side routing.
+
+    Pages with injected meta tags are rendered and compressed once, then served
+    from the response cache until one of `tags` (what the meta tags were built
+    from) is invalidated.
+    """
     if USE_REACT_FRONTEND:
         if meta_tags:
-            html = inject_meta_tags(_get_react_html(), meta_tags)
-            return make_response(html)
-        return send_from_directory(REACT_BUILD_DIR, "index.html")
+            cache_key = f"page:{request.path}"
+            payload = cache_fetch_payload(cache_key, lambda: CachedPayload(
+                inject_meta_tags(_get_react_html(), meta_tags).encode("utf-8"), mimetype="text/html"
+            ), tags)
+            return cached_response(payload)
+        return cached_response(_get_react_payload())
     # Fallback to Jinja templates if React build doesn't exist
-    areas = db.session.query(Mosque.area).distinct().all()
-    areas = [area[0] for area in areas]
+    areas = list(get_catalog().rows_by_area)
     return render_template("index.html", areas=areas)
 
 
@@ -97,7 +113,7 @@ def serve_react_app(meta_tags=None):
 def index():
     if USE_REACT_FRONTEND:
         try:
-            count = db.session.query(Mosque).count()
+            count = len(get_catalog().mosques)
             areas = ["شمال", "جنوب", "شرق", "غرب"]
             ssr_body = (
                 f'<h1>أئمة التراويح في الرياض - رمضان ١٤٤٧</h1>'
@@ -105,7 +121,7 @@ def index():
                 f'ابحث عن المسجد الأقرب إليك واستمع لتلاوات الأئمة.</p>'
                 f'<ul>{"".join(f"<li>مساجد {a} الرياض</li>" for a in areas)}</ul>'
             )
-            return serve_react_app(meta_tags={"ssr_body": ssr_body})
+            return serve_react_app(meta_tags={"ssr_body": ssr_body}, tags=("mosques",))
         except Exception:
             pass
     return serve_react_app()
@@ -137,9 +153,9 @@ def contact():
 def mosque_detail(mosque_id):
     if USE_REACT_FRONTEND:
         try:
-            mosque = Mosque.query.get(mosque_id)
-            if mosque:
-                imam = Imam.query.filter_by(mosque_id=mosque.id).first()
+            row = get_catalog().mosque_row(mosque_id)
+            if row:
+                mosque, imam = row
                 imam_name = imam.name if imam else "غير محدد"
                 description = f"استمع لتلاوة {imam_name} في {mosque.name} - حي {mosque.location}، {mosque.area} الرياض"
 
@@ -193,15 +209,17 @@ def mosque_detail(mosque_id):
                     "url": f"https://taraweeh.org/mosque/{mosque_id}",
                     "jsonld": jsonld,
                     "ssr_body": ssr_body,
-                })
+                }, tags=(f"mosque:{mosque_id}",))
         except Exception:
             pass
         return serve_react_app()
 
     # Fallback to Jinja template
     try:
-        mosque = Mosque.query.get_or_404(mosque_id)
-        imam = Imam.query.filter_by(mosque_id=mosque.id).first()
+        row = get_catalog().mosque_row(mosque_id)
+        if not row:
+            abort(404)
+        mosque, imam = row
         return render_template("mosque_detail.html", mosque=mosque, imam=imam)
     except Exception as e:
         print(f"Error displaying mosque detail: {e}")
@@ -228,7 +246,7 @@ def user_profile_page(username):
                 "title": f"مفضلات {user.display_name or user.username} - أئمة التراويح",
                 "description": f"قائمة المساجد المفضلة لـ {user.display_name or user.username}",
                 "url": f"https://taraweeh.org/u/{username}",
-            })
+            }, tags=(f"user:{user.id}",))
         return serve_react_app()
     return redirect("/")
 
@@ -242,7 +260,7 @@ def user_favorites_page(username):
                 "title": f"مفضلات {user.display_name or user.username} - أئمة التراويح",
                 "description": f"قائمة المساجد المفضلة لـ {user.display_name or user.username}",
                 "url": f"https://taraweeh.org/u/{username}/favorites",
-            })
+            }, tags=(f"user:{user.id}",))
         return serve_react_app()
     return redirect("/")
 
@@ -8,26 +8,15 @@ from flask_login import current_user, login_required
 from auth_utils import firebase_auth_required, admin_or_moderator_required
 from extensions import limiter
 from models import Imam, ImamTransferRequest, Mosque, PublicUser, db
-from services.cache import invalidate_caches
-from services.search import get_imam_index, score_imam
+from services.cache import CachedPayload, cached_response, invalidate_written, search_result_cache
+from services.catalog import get_catalog
+from services.leaderboard import award_points
+from services.search import compile_query, get_imam_index, rank_imams
 from utils import normalize_arabic
 
 transfers_bp = Blueprint("transfers", __name__)
 
 
-def _strip_prefixes(text):
-    text = text.strip()
-    for prefix in ['الشيخ ', 'شيخ ', 'الامام ', 'امام ']:
-        if text.startswith(prefix):
-            text = text[len(prefix):].strip()
-            break
-    words = text.split()
-    stripped = []
-    for w in words:
-        stripped.append(w[2:] if w.startswith('ال') and len(w) > 2 else w)
-    return ' '.join(stripped)
-
-
 @transfers_bp.route("/api/imams/search")
 @limiter.limit("30 per minute")
 def search_imams():
@@ -35,25 +24,23 @@ def search_imams():
     if not q:
         return jsonify([])
     q_norm = normalize_arabic(q)
-    q_stripped = _strip_prefixes(q_norm)
-    if not q_stripped:
+    query = compile_query(q_norm)
+    if not query['stripped']:
         return jsonify([])
-    q_words = q_norm.split()
-    q_stripped_words = q_stripped.split()
+    cache_key = ("imams", get_catalog().version, q_norm)
+    payload = search_result_cache.get(cache_key)
+    if payload is not None:
+        return cached_response(payload)
 
-    index = get_imam_index()
-    scored = []
-    for entry in index:
-        s = score_imam(q_norm, q_stripped, q_words, q_stripped_words, entry)
-        if s > 0:
-            scored.append((s, entry))
-    scored.sort(key=lambda x: -x[0])
-    return jsonify([{
+    top = rank_imams(get_imam_index(), query, limit=15)
+    payload = CachedPayload.from_value([{
         "id": e['imam'].id,
         "name": e['imam'].name,
         "mosque_name": e['mosque'].name if e['mosque'] else None,
         "mosque_id": e['imam'].mosque_id,
-    } for _, e in scored[:15]])
+    } for e in top], precompress=False)
+    search_result_cache.set(cache_key, payload)
+    return cached_response(payload)
 
 
 @transfers_bp.route("/api/transfers", methods=["POST"])
@@ -159,7 +146,9 @@ def approve_transfer(transfer_id):
     tr.reviewed_at = datetime.datetime.utcnow()
     tr.reviewed_by = current_user.id
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
+    if submitter:
+        award_points(submitter.id)
     return jsonify({"success": True})
 
 
@@ -242,7 +231,9 @@ def admin_approve_transfer(transfer_id):
     tr.status = "approved"
     tr.reviewed_at = datetime.datetime.utcnow()
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
+    if submitter:
+        award_points(submitter.id)
     return jsonify({"success": True})
 
 
@@ -259,5 +250,5 @@ def admin_reject_transfer(transfer_id):
     tr.reject_reason = data.get("reason", "").strip() or None
     tr.reviewed_at = datetime.datetime.utcnow()
     db.session.commit()
-    invalidate_caches()
+    invalidate_written()
     return jsonify({"success": True})
@@ -37,6 +37,10 @@ class Config:
 
     COMPRESS_MIN_SIZE = 500
 
+    # Verified Firebase ID tokens are cached until their exp; this is how often (seconds)
+    # a cached token is re-checked with Firebase for revocation
+    FIREBASE_REVOCATION_CHECK_INTERVAL = int(os.environ.get("FIREBASE_REVOCATION_CHECK_INTERVAL", 300))
+
     WTF_CSRF_CHECK_DEFAULT = False
 
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
@@ -28,6 +28,7 @@ class Mosque(db.Model):
     map_link = db.Column(db.String(500))
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     def __repr__(self):
         return self.name
@@ -161,6 +162,7 @@ class Imam(db.Model):
     mosque_id = db.Column(db.Integer, db.ForeignKey('mosque.id'), nullable=True)
     audio_sample = db.Column(db.String(500), nullable=True)
     youtube_link = db.Column(db.String(500), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     # Relationship
     mosque = db.relationship('Mosque', backref=db.backref('imams', lazy=True))
@@ -1,46 +1,590 @@
-"""API response cache — Redis-backed with in-memory fallback."""
+"""API response cache — two tiers: a bounded in-process LRU (L1) over Redis (L2).
 
-from services.redis_client import redis_delete_pattern, redis_get, redis_set
-from services.search import invalidate_imam_index
+Entries hold the final response body (exactly what `jsonify` would send) plus
+a content-hash ETag and gzip/brotli/zstd variants, each compressed the first
+time a client negotiates it, so a cache hit never re-encodes or re-compresses,
+and a client that already has the body gets a 304. One-off payloads (search
+results, read-your-writes builds) skip the variants and are compressed per
+response by Flask-Compress.
 
-# In-memory fallback (used when Redis is unavailable)
-_local_cache = {}
+`cache_fetch` is single-flight: concurrent misses for a key in one worker wait
+for a single rebuild (per-key event), and workers coordinate through a short
+Redis lock so only one of them runs the rebuild while the rest poll L2.
+
+Entries are tagged with what they were built from (`mosques`, `mosque:42`,
+`area:شمال`...; see services/cache_tags.py) and dropped on read once one of
+those tags is bumped, so a write only costs the entries that depend on it.
+Keys live in a namespace named after the global tag's version
+(`taraweeh:v{n}:mosques`): a full flush is a single HINCRBY, and entries in
+the old namespace are never read again and expire by TTL.
+
+In Redis an entry is one value: a small JSON header (etag, mimetype, build
+time, tags), a newline, then the body bytes exactly as served. Reading it
+parses only the header; the body is never decoded or re-encoded.
+
+Entries are fresh for SOFT_TTL seconds and kept until CACHE_TTL (hard).
+In between, `cache_fetch` serves the stale payload immediately and hands the
+rebuild to one background thread, so hot keys are refreshed ahead of expiry
+and their readers never wait on the database.
+
+Writes are coalesced: `invalidate_written` bumps the shared tag versions and
+catalog generation right away (one HINCRBY / INCR round trip each), so no
+write is lost if the worker exits. It queues the local side — adopting the
+new versions, dropping search results, the pub/sub announcement — for a
+flusher thread that runs once writes go quiet for INVALIDATION_DEBOUNCE
+seconds (never later than INVALIDATION_MAX_DELAY after the first). A bulk
+admin edit therefore costs this worker one catalog rebuild, not one per row.
+Other workers pick the bumps up on their next version check. The writer
+itself reads around the caches meanwhile (read-your-writes).
+
+Every commit of the app session queues what it wrote (an `after_commit`
+listener), so writes from routes that never call `invalidate_written` —
+Flask-Admin views, say — still reach the caches. Routes call it to add
+tags the collector cannot see and to start the writer's read-your-writes
+window.
+"""
+
+import gzip
+import hashlib
+import threading
+import time
+import uuid
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from models import db
+from services.cache_tags import (
+    GLOBAL_TAG, built_from_latest_catalog, bump_tags, committed_tags, is_current, namespace,
+    observe_tags, snapshot, written_tags,
+)
+from services.catalog import invalidate_catalog
+from services.generation import bump_generation, current_generation
+from services.invalidation import (
+    mark_writer,
+    publish_invalidation,
+    read_your_writes_active,
+    register_invalidation_handler,
+)
+from services.lru import LRUCache
+from services.redis_client import (
+    decode_value,
+    encode_value,
+    redis_delete,
+    redis_get,
+    redis_get_raw,
+    redis_set_nx,
+    redis_set_raw,
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli ships with flask-compress
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard ships with flask-compress
+    zstandard = None
 
 CACHE_PREFIX = "taraweeh:"
-CACHE_TTL = 300  # 5 minutes
+CACHE_TTL = 300  # 5 minutes: hard expiry, in both tiers (and for abandoned namespaces)
+SOFT_TTL = 240  # after this, serve stale and refresh in the background
+
+# L1: bounded, entries expire with their payload; also the only tier when Redis is unavailable.
+# Writes clear L1 in every worker via the invalidation bus.
+L1_MAX_ENTRIES = 512
+_local_cache = LRUCache(maxsize=L1_MAX_ENTRIES)
+
+# Single-flight rebuilds
+LOCK_PREFIX = CACHE_PREFIX + "lock:"
+LOCK_TTL = 10  # seconds; a crashed rebuilder never blocks a key for longer
+REBUILD_WAIT = 5.0  # seconds a waiter gives the rebuilder before building itself
+REMOTE_POLL_INTERVAL = 0.05
+_inflight = {}  # key -> threading.Event set when its rebuild finishes
+_inflight_lock = threading.Lock()
+_refreshing = set()  # keys with a background refresh running in this worker
+
+_stats_lock = threading.Lock()
+_stats = dict.fromkeys(
+    ("l1_hits", "l2_hits", "misses", "rebuilds", "rebuild_seconds", "waiters", "remote_waits",
+     "stale_served", "refreshes", "refresh_errors", "bypassed", "invalidations_queued",
+     "invalidation_flushes", "stale_builds"), 0
+)
+
+# Coalesced invalidation
+INVALIDATION_DEBOUNCE = 0.5  # seconds of quiet before queued tags are flushed
+INVALIDATION_MAX_DELAY = 2.0  # seconds after the first queued write at the latest
+_pending_tags = set()
+_pending_versions = {}  # tag -> version already bumped in Redis, not yet adopted here
+_pending_generation = None
+_pending_since = None  # monotonic time of the first write in the current window
+_last_queued = None
+_flusher = None
+_pending_lock = threading.Lock()
+
+# Flask-Compress's levels: higher ones cost several times the CPU on a cache fill for a few percent
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+PRECOMPRESS_MIN_SIZE = 500  # mirrors COMPRESS_MIN_SIZE
+
+# Process-local search results, keyed on the normalized query + filters + catalog version
+SEARCH_CACHE_SIZE = 2048
+search_result_cache = LRUCache(maxsize=SEARCH_CACHE_SIZE)
+
+# Flask-Compress rewrites ETags as "<etag>:<algorithm>"
+ENCODING_SUFFIXES = ("gzip", "br", "zstd", "deflate")
+
+
+def _supported_encodings():
+    """Content-Encodings we can precompress, best ratio first."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+SUPPORTED_ENCODINGS = _supported_encodings()
+
+
+def _compress(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CachedPayload:
+    """Encoded response body + strong ETag + lazily compressed variants + build time (unix)
+    + the tag versions it was built from.
+
+    `encodings` lists the Content-Encodings this payload serves from its own
+    variants; pass precompress=False for payloads served about once.
+    """
+
+    __slots__ = ("body", "etag", "mimetype", "encodings", "variants", "built_at", "tags")
+
+    def __init__(
+        self, body, etag=None, mimetype="application/json", built_at=None, tags=None, precompress=True,
+    ):
+        self.body = body
+        self.etag = etag or hashlib.sha256(body).hexdigest()[:32]
+        self.mimetype = mimetype
+        self.encodings = SUPPORTED_ENCODINGS if precompress and len(body) >= PRECOMPRESS_MIN_SIZE else ()
+        self.variants = {}
+        self.built_at = built_at if built_at is not None else time.time()
+        self.tags = tags or {}
+
+    def variant(self, encoding):
+        """The body compressed with `encoding`, built on first use.
+
+        Two requests racing on a new encoding may both compress it; the last
+        assignment wins and the bytes are identical.
+        """
+        data = self.variants.get(encoding)
+        if data is None:
+            data = self.variants[encoding] = _compress(self.body, encoding)
+        return data
+
+    def age(self):
+        return time.time() - self.built_at
+
+    def remaining_ttl(self):
+        return CACHE_TTL - self.age()
+
+    @classmethod
+    def from_value(cls, value, precompress=True):
+        return cls(current_app.json.response(value).get_data(), precompress=precompress)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_stats():
+    """Counters for the admin dashboard: tier hits, misses, rebuild time and waiters."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+    stats["rebuild_seconds"] = round(stats["rebuild_seconds"], 3)
+    stats["hit_rate"] = round((stats["l1_hits"] + stats["l2_hits"]) / lookups, 4) if lookups else 0.0
+    stats["l1"] = _local_cache.stats()
+    return stats
+
+
+def _namespaced(key):
+    """`v{n}:{key}` — the name a key has in the current cache namespace."""
+    return f"v{namespace()}:{key}"
+
+
+def _pack(payload):
+    """Redis value for a payload: JSON header, newline, raw body."""
+    header = encode_value({
+        "etag": payload.etag,
+        "mimetype": payload.mimetype,
+        "built_at": payload.built_at,
+        "tags": payload.tags,
+    })
+    return header + b"\n" + payload.body
+
+
+def _unpack(data):
+    """(header, body) from a packed value; (None, None) if it is not one."""
+    header, sep, body = data.partition(b"\n")  # compact JSON never contains a raw newline
+    header = decode_value(header) if sep else None
+    if not isinstance(header, dict) or "etag" not in header:
+        return None, None
+    return header, body
+
+
+def _l2_get(key):
+    """Payload from Redis, reusing the L1 copy (and its compressed variants) when the body is unchanged."""
+    data = redis_get_raw(CACHE_PREFIX + key)
+    if data is None:
+        return None
+    val, body = _unpack(data)
+    if val is None or not is_current(val.get("tags", {})):
+        return None
+    local = _local_cache.peek(key)
+    built_at = val.get("built_at")
+    if local is not None and local[0].etag == val["etag"]:
+        payload = local[0]
+        if built_at is not None:
+            payload.built_at = max(payload.built_at, built_at)
+        payload.tags = val.get("tags", {})
+    else:
+        payload = CachedPayload(
+            body, val["etag"], val.get("mimetype", "application/json"), built_at, val.get("tags"),
+        )
+    _local_cache.set(key, payload, ttl=payload.remaining_ttl())
+    return payload
+
+
+def _l1_get(key):
+    payload = _local_cache.get(key)
+    if payload is not None and not is_current(payload.tags):
+        _local_cache.pop(key)
+        return None
+    return payload
+
+
+def _get(key):
+    payload = _l1_get(key)
+    if payload is not None:
+        _count("l1_hits")
+        return payload
+    payload = _l2_get(key)
+    if payload is not None:
+        _count("l2_hits")
+        return payload
+    _count("misses")
+    return None
 
 
 def cache_get(key):
-    """Get a cached API response. Tries Redis first, falls back to local dict."""
-    full_key = CACHE_PREFIX + key
+    """Get a cached payload from L1, then L2. None on a miss."""
+    return _get(_namespaced(key))
+
+
+def _set(key, payload):
+    redis_set_raw(CACHE_PREFIX + key, _pack(payload), ttl=CACHE_TTL)
+    _local_cache.set(key, payload, ttl=payload.remaining_ttl())
+    return payload
+
+
+def cache_set_payload(key, payload, tags=()):
+    """Cache an already-built payload in both tiers, tagged with what it depends on."""
+    if not payload.tags:
+        payload.tags = snapshot(tags)
+    return _set(_namespaced(key), payload)
+
+
+def cache_set(key, value, tags=()):
+    """Encode and cache a JSON API response."""
+    return cache_set_payload(key, CachedPayload.from_value(value), tags)
+
+
+def _store_build(key, payload, recorded):
+    """Store a fresh build unless it came from a catalog snapshot older than the latest generation."""
+    payload.tags = recorded
+    if built_from_latest_catalog(recorded):
+        _set(key, payload)
+    else:
+        _count("stale_builds")
+    return payload
+
+
+def _build_and_store(key, build, recorded):
+    start = time.perf_counter()
+    payload = _store_build(key, build(), recorded)
+    _count("rebuilds")
+    _count("rebuild_seconds", time.perf_counter() - start)
+    return payload
+
+
+def _rebuild(key, build, recorded):
+    """Rebuild a key, letting only one worker do it when Redis is there."""
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    acquired = redis_set_nx(lock_key, token, ttl=LOCK_TTL)
+    if acquired is None:  # no Redis: this worker's single flight is all there is
+        return _build_and_store(key, build, recorded)
+    if acquired:
+        try:
+            return _build_and_store(key, build, recorded)
+        finally:
+            if redis_get(lock_key) == token:
+                redis_delete(lock_key)
+
+    # Another worker is rebuilding: poll L2 for its result
+    _count("remote_waits")
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REMOTE_POLL_INTERVAL)
+        payload = _l2_get(key)
+        if payload is not None:
+            return payload
+    return _build_and_store(key, build, recorded)
+
+
+def _refresh(app, key, build, recorded):
+    """Background rebuild of a stale key; skipped if another worker holds the key's lock.
+
+    The recorded tag versions predate the build, so a refresh that races an
+    invalidation is discarded on read.
+    """
+    lock_key = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    try:
+        if redis_set_nx(lock_key, token, ttl=LOCK_TTL) is False:
+            return
+        try:
+            with app.app_context():
+                start = time.perf_counter()
+                _store_build(key, build(), recorded)
+                _count("refreshes")
+                _count("rebuild_seconds", time.perf_counter() - start)
+        finally:
+            if redis_get(lock_key) == token:
+                redis_delete(lock_key)
+    except Exception as e:
+        _count("refresh_errors")
+        print(f"Background cache refresh failed for {key}: {e}")
+    finally:
+        with _inflight_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key, build, recorded):
+    with _inflight_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    app = current_app._get_current_object()
+    threading.Thread(
+        target=_refresh, args=(app, key, build, recorded),
+        name=f"cache-refresh:{key}", daemon=True,
+    ).start()
+
+
+def cache_fetch_payload(key, build, tags=()):
+    """Cached payload for `key`, calling `build()` -> CachedPayload on a miss — at most once at a time.
+
+    `tags` name what the payload depends on; bumping any of them drops it.
+    A payload past SOFT_TTL is returned as is while a background thread rebuilds it.
+    """
+    if read_your_writes_active(catalog=True):
+        # The writer must see its own write even before the queued invalidation lands
+        _count("bypassed")
+        payload = build()
+        payload.encodings = ()  # served once: leave compression to Flask-Compress
+        return payload
+    key = _namespaced(key)
+    recorded = snapshot(tags)  # before building: a write during the build invalidates the result
+    payload = _get(key)
+    if payload is not None:
+        if payload.age() >= SOFT_TTL:
+            _count("stale_served")
+            _schedule_refresh(key, build, recorded)
+        return payload
+
+    with _inflight_lock:
+        event = _inflight.get(key)
+        leader = event is None
+        if leader:
+            event = _inflight[key] = threading.Event()
+
+    if not leader:
+        _count("waiters")
+        event.wait(REBUILD_WAIT)
+        payload = _l1_get(key)
+        return payload if payload is not None else _build_and_store(key, build, recorded)
+
+    try:
+        # A rebuild that finished between our miss and taking the lead already filled the cache
+        payload = _l1_get(key) or _l2_get(key)
+        if payload is None:
+            payload = _rebuild(key, build, recorded)
+        return payload
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        event.set()
+
+
+def cache_fetch(key, build_value, tags=()):
+    """Like cache_fetch_payload for JSON responses: `build_value()` returns the value to jsonify."""
+    return cache_fetch_payload(key, lambda: CachedPayload.from_value(build_value()), tags)
+
+
+def cached_response(payload):
+    """Serve a cached payload in the best encoding the client accepts, compressing it on first use.
+
+    Answers If-None-Match with 304 Not Modified. Responses that already carry a
+    Content-Encoding are left alone by Flask-Compress.
+    """
+    if_none_match = request.if_none_match
+    if if_none_match:
+        for candidate in (payload.etag, *(f"{payload.etag}:{s}" for s in ENCODING_SUFFIXES)):
+            if if_none_match.contains(candidate):
+                response = current_app.response_class(status=304)
+                response.set_etag(candidate)
+                response.headers["Cache-Control"] = "no-cache"
+                response.vary.add("Accept-Encoding")
+                return response
+
+    encoding = None
+    if payload.encodings:
+        encoding = request.accept_encodings.best_match(payload.encodings)
+    if encoding:
+        response = current_app.response_class(payload.variant(encoding), mimetype=payload.mimetype)
+        response.headers["Content-Encoding"] = encoding
+        response.set_etag(f"{payload.etag}:{encoding}")
+    else:
+        response = current_app.response_class(payload.body, mimetype=payload.mimetype)
+        response.set_etag(payload.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@register_invalidation_handler
+def _drop_search_results():
+    """Search results are keyed by catalog version; free the old ones when the catalog moves."""
+    search_result_cache.clear()
+
+
+def invalidate_caches(*tags, catalog=True):
+    """Invalidate cached responses after a write.
+
+    With no tags everything is flushed (one HINCRBY moves the namespace).
+    With tags, only entries depending on one of them are dropped. Mosque/imam
+    writes also rebuild the catalog snapshot; pass catalog=False for writes
+    that do not touch it (user roles, leaderboard).
+    """
+    generation = None
+    if catalog or not tags:
+        # Every worker drops its snapshot (and the search indexes derived from it). Bumped
+        # before the tags, so no reader pairs the new tag versions with the old snapshot.
+        generation = invalidate_catalog()
+        search_result_cache.clear()
+    bumped = bump_tags(tags or (GLOBAL_TAG,))
+    if not tags:
+        _local_cache.clear()
+    publish_invalidation(generation, bumped)
+
 
-    # Try Redis
-    val = redis_get(full_key)
-    if val is not None:
-        return val
+def flush_invalidations():
+    """Adopt every queued (already bumped) invalidation in this worker and announce it. Returns the tags."""
+    global _pending_since, _last_queued, _pending_generation
+    with _pending_lock:
+        tags = set(_pending_tags)
+        bumped = dict(_pending_versions)
+        generation = _pending_generation
+        _pending_tags.clear()
+        _pending_versions.clear()
+        _pending_since = _last_queued = _pending_generation = None
+    if tags:
+        if generation is not None:
+            # Re-read rather than adopt ours: a later bump may already be out
+            generation = current_generation(fresh=True)
+            search_result_cache.clear()
+        observe_tags(bumped)
+        publish_invalidation(generation, bumped)
+        _count("invalidation_flushes")
+    return tags
 
-    # Fallback to local
-    return _local_cache.get(key)
 
+def _flush_when_quiet():
+    global _flusher
+    while True:
+        with _pending_lock:
+            if not _pending_tags:
+                _flusher = None
+                return
+            due = min(_last_queued + INVALIDATION_DEBOUNCE, _pending_since + INVALIDATION_MAX_DELAY)
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            continue
+        try:
+            flush_invalidations()
+        except Exception as e:
+            print(f"Queued cache invalidation failed: {e}")
 
-def cache_set(key, value):
-    """Cache an API response. Writes to both Redis and local dict."""
-    full_key = CACHE_PREFIX + key
 
-    # Write to Redis (with TTL)
-    redis_set(full_key, value, ttl=CACHE_TTL)
+def queue_invalidation(*tags):
+    """Bump `tags` (and the catalog generation for mosque/imam writes) in the shared store now,
+    and queue their local application for the next coalesced flush."""
+    global _pending_since, _last_queued, _flusher, _pending_generation
+    if not tags:
+        return
+    generation = bump_generation(observe=False) if "mosques" in tags else None
+    bumped = bump_tags(tags, observe=False)
+    now = time.monotonic()
+    with _pending_lock:
+        _pending_tags.update(tags)
+        _pending_versions.update(bumped)
+        if generation is not None:
+            _pending_generation = generation
+        _last_queued = now
+        if _pending_since is None:
+            _pending_since = now
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_when_quiet, name="cache-invalidation-flush", daemon=True
+            )
+            _flusher.start()
+    _count("invalidations_queued")
 
-    # Always write to local as fallback
-    _local_cache[key] = value
 
+def invalidate_written(*extra_tags):
+    """Invalidate exactly what this request's Mosque/Imam/PublicUser writes touched (plus `extra_tags`).
 
-def invalidate_caches():
-    """Invalidate all caches after admin write operations."""
-    # Clear Redis keys
-    redis_delete_pattern(CACHE_PREFIX + "*")
+    Call after commit. Writes that touched nothing cached are free. The
+    committed writes were already queued by the session's after_commit hook;
+    this adds `extra_tags` (and anything flushed but not committed) and opens
+    the writer's read-your-writes window: it reads around the caches until
+    the invalidation lands (around the catalog and response cache only if it
+    wrote a mosque or imam).
+    """
+    tags = written_tags() | set(extra_tags)
+    touched = committed_tags() | tags
+    if touched:
+        mark_writer(catalog=any(tag == "mosques" or tag.startswith("mosque:") for tag in touched))
+    queue_invalidation(*tags)
 
-    # Clear local fallback
-    _local_cache.clear()
 
-    # Clear imam search index (process-local, cheap to rebuild)
-    invalidate_imam_index()
+@event.listens_for(db.session, "after_commit")
+def _invalidate_committed(session):
+    """Queue what every commit wrote, whichever route or admin view made it."""
+    tags = written_tags(session)
+    if tags:
+        session.info.setdefault("committed_tags", set()).update(tags)
+        queue_invalidation(*tags)
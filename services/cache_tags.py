@@ -0,0 +1,272 @@
+"""Cache tag versions — one counter per dependency (`mosque:42`, `area:شمال`, `user:7`...).
+
+Tags in use:
+    mosques      anything built from the whole catalog (listings, facets, sitemap, search)
+    mosque:<id>  one mosque's page (its row and its imam)
+    area:<name>  the locations of one area
+    imam:<id>    one imam
+    user:<id>    one public user's profile pages
+    username:<n> the same user's /api/u/<username> endpoints (resolvable without a query)
+    uid:<uid>    the same user's own /api/user/* data, keyed by Firebase uid
+    leaderboard  contribution standings and the names/avatars shown on them
+
+Cached payloads record the versions of the tags they were built from and are
+discarded on read once any of them moves, so a write only costs the entries
+that actually depend on what changed. The GLOBAL_TAG version names the whole
+cache namespace; bumping it flushes everything.
+
+Catalog-wide tags (a bounded set: mosques, areas, imams, leaderboard...) live
+in one Redis hash; each worker keeps a copy that it refreshes at most every
+TAG_CHECK_INTERVAL seconds and that the invalidation bus updates immediately.
+Per-user tags (user:, username:, uid:) grow with the user base, so each has
+its own Redis key expiring after USER_TAG_TTL, read with MGET only when a
+request needs it and remembered per worker for TAG_CHECK_INTERVAL. Their
+versions are bump timestamps rather than counters, so a key that expired
+and comes back never repeats a version. Without Redis the versions are
+process-local.
+
+Shared versions never move backwards in a worker: a reading from Redis is
+merged by taking the higher value, bumps made while Redis was unreachable
+are written back once it returns, and a bump on a hash that was reset
+continues above the last version seen. Otherwise entries recorded before a
+write would become current again.
+
+Entries built from the catalog also record the catalog generation they were
+built against (the GENERATION_TAG pseudo-tag). Tags and the generation are
+refreshed on separate timers, so a build can pair new tag versions with a
+snapshot that has not caught up with the write yet; such a build is served
+but not stored (see `built_from_latest_catalog`). The pseudo-tag is not
+compared on read, so a write still only drops the entries tagged with what
+it touched.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event, inspect
+
+from models import Imam, Mosque, PublicUser, TaraweehAttendance, UserFavorite, db
+from services.generation import current_generation
+from services.lru import LRUCache
+from services.redis_client import (
+    redis_hgetall, redis_hincrby_many, redis_is_available, redis_mget, redis_pipeline,
+)
+
+TAGS_KEY = "taraweeh:tags"
+TAG_CHECK_INTERVAL = 2.0  # seconds a worker trusts its copy of the versions
+GLOBAL_TAG = "*"
+GENERATION_TAG = "@catalog"  # pseudo-tag: the catalog generation an entry was built against
+CATALOG_TAG_PREFIXES = ("mosque:", "area:", "imam:")
+
+USER_TAG_PREFIXES = ("user:", "username:", "uid:")
+USER_TAG_KEY_PREFIX = "taraweeh:tag:"
+USER_TAG_TTL = 30 * 24 * 3600  # far longer than any cached entry or client revalidation gap
+USER_TAG_CACHE_SIZE = 4096
+
+_versions = {}
+_unsynced = set()  # shared tags bumped locally while Redis was unreachable
+_checked_at = None
+_lock = threading.Lock()
+_user_versions = LRUCache(maxsize=USER_TAG_CACHE_SIZE)  # copies of Redis values, TAG_CHECK_INTERVAL TTL
+_local_user_versions = LRUCache(maxsize=USER_TAG_CACHE_SIZE)  # the versions themselves, without Redis
+
+
+def _shared_versions():
+    global _versions, _checked_at
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < TAG_CHECK_INTERVAL:
+        return _versions
+    remote = redis_hgetall(TAGS_KEY) if redis_is_available() else None
+    ahead = {}
+    with _lock:
+        if remote is not None:
+            remote = {tag: int(v) for tag, v in remote.items()}
+            merged = dict(_versions)
+            for tag, version in remote.items():
+                if version > merged.get(tag, 0):
+                    merged[tag] = version
+            ahead = {tag: merged[tag] for tag in _unsynced if merged.get(tag, 0) > remote.get(tag, 0)}
+            _unsynced.clear()
+            _versions = merged
+        _checked_at = now
+        versions = _versions
+    if ahead:
+        _push_versions(ahead)
+    return versions
+
+
+def _push_versions(versions):
+    """Raise shared versions in Redis to ones this worker already uses."""
+    redis_pipeline(*(("hset", TAGS_KEY, tag, version) for tag, version in versions.items()))
+
+
+def _user_tag_versions(tags):
+    if not redis_is_available():
+        return {tag: _local_user_versions.get(tag, 0) for tag in tags}
+    versions, missing = {}, []
+    for tag in tags:
+        version = _user_versions.get(tag)
+        if version is None:
+            missing.append(tag)
+        else:
+            versions[tag] = version
+    if missing:
+        for tag, value in zip(missing, redis_mget([USER_TAG_KEY_PREFIX + tag for tag in missing])):
+            versions[tag] = int(value) if value is not None else 0
+            _user_versions.set(tag, versions[tag], ttl=TAG_CHECK_INTERVAL)
+    return versions
+
+
+def tag_versions(tags):
+    """{tag: version} for `tags` (tags never bumped are at version 0)."""
+    shared = _shared_versions()
+    versions, user = {}, []
+    for tag in tags:
+        if tag == GENERATION_TAG:
+            versions[tag] = current_generation()
+        elif tag.startswith(USER_TAG_PREFIXES):
+            user.append(tag)
+        else:
+            versions[tag] = shared.get(tag, 0)
+    if user:
+        versions.update(_user_tag_versions(user))
+    return versions
+
+
+def _built_from_catalog(tags):
+    return any(tag == "mosques" or tag.startswith(CATALOG_TAG_PREFIXES) for tag in tags)
+
+
+def snapshot(tags):
+    """Current versions of `tags` (plus the global tag, and the catalog generation for
+    catalog-derived entries), to store alongside a payload."""
+    extra = (GENERATION_TAG,) if _built_from_catalog(tags) else ()
+    return tag_versions((GLOBAL_TAG, *extra, *tags))
+
+
+def is_current(recorded):
+    """True if none of the recorded tag versions has moved since."""
+    tags = [tag for tag in recorded if tag != GENERATION_TAG]
+    versions = tag_versions(tags)
+    return all(versions[tag] == recorded[tag] for tag in tags)
+
+
+def built_from_latest_catalog(recorded):
+    """False if an entry recorded a catalog generation that is no longer the latest one."""
+    return GENERATION_TAG not in recorded or recorded[GENERATION_TAG] == current_generation(fresh=True)
+
+
+def namespace():
+    return _shared_versions().get(GLOBAL_TAG, 0)
+
+
+def _bump_user_tags(tags, observe):
+    version = time.time_ns()
+    bumped = dict.fromkeys(tags, version)
+    stored = redis_pipeline(*(("set", USER_TAG_KEY_PREFIX + tag, version, USER_TAG_TTL) for tag in tags))
+    if stored is None:
+        for tag in tags:
+            _local_user_versions.set(tag, version)
+    elif observe:
+        observe_tags(bumped)
+    return bumped
+
+
+def bump_tags(tags, observe=True):
+    """Invalidate every entry depending on `tags`. Returns {tag: new version}.
+
+    With observe=False and Redis up, this worker keeps its copy of the
+    versions until `observe_tags(bumped)` (or the next check); without Redis
+    the local versions are the only ones and move right away.
+    """
+    tags = sorted(set(tags))
+    user = [tag for tag in tags if tag.startswith(USER_TAG_PREFIXES)]
+    shared = [tag for tag in tags if not tag.startswith(USER_TAG_PREFIXES)]
+    bumped = _bump_user_tags(user, observe) if user else {}
+    if shared:
+        remote = redis_hincrby_many(TAGS_KEY, shared)
+        ahead = {}
+        with _lock:
+            if remote is None:
+                remote = {tag: _versions.get(tag, 0) + 1 for tag in shared}
+                _unsynced.update(shared)
+                _versions.update(remote)
+            else:
+                for tag, version in remote.items():
+                    if version <= _versions.get(tag, 0):  # the hash was reset (Redis flushed/restarted)
+                        remote[tag] = ahead[tag] = _versions[tag] + 1
+                if observe:
+                    _versions.update(remote)
+        if ahead:
+            _push_versions(ahead)
+        bumped.update(remote)
+    return bumped
+
+
+def observe_tags(bumped):
+    """Adopt tag versions announced by another worker."""
+    shared = {}
+    for tag, version in bumped.items():
+        if tag.startswith(USER_TAG_PREFIXES):
+            _user_versions.set(tag, version, ttl=TAG_CHECK_INTERVAL)
+        else:
+            shared[tag] = version
+    with _lock:
+        _versions.update({tag: v for tag, v in shared.items() if v > _versions.get(tag, 0)})
+
+
+# --- tags touched by a session's writes ---
+
+# PublicUser columns shown on the leaderboard
+_LEADERBOARD_COLUMNS = ("contribution_points", "username", "display_name", "avatar_url")
+
+
+def user_tags(user):
+    """Every tag naming one public user's data."""
+    return {f"user:{user.id}", f"username:{user.username}", f"uid:{user.firebase_uid}"}
+
+def _values(obj, attr):
+    """Old and new values of an attribute in the flush being processed."""
+    history = inspect(obj).attrs[attr].history
+    return {v for v in (*history.added, *history.deleted, *history.unchanged) if v is not None}
+
+
+def _object_tags(obj):
+    if isinstance(obj, Mosque):
+        return {"mosques", f"mosque:{obj.id}", *(f"area:{a}" for a in _values(obj, "area"))}
+    if isinstance(obj, Imam):
+        return {"mosques", f"imam:{obj.id}", *(f"mosque:{m}" for m in _values(obj, "mosque_id"))}
+    if isinstance(obj, PublicUser):
+        tags = {f"user:{obj.id}", f"uid:{obj.firebase_uid}"}
+        tags.update(f"username:{name}" for name in _values(obj, "username"))
+        attrs = inspect(obj).attrs
+        if any(attrs[column].history.has_changes() for column in _LEADERBOARD_COLUMNS):
+            tags.add("leaderboard")
+        return tags
+    if isinstance(obj, (UserFavorite, TaraweehAttendance)):
+        # The owner's username/uid tags are not loaded here; writers add them with user_tags()
+        return {f"user:{obj.user_id}"}
+    return set()
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_written_tags(session, flush_context):
+    # After the flush, new rows have ids and attribute history still holds the old values
+    tags = session.info.setdefault("cache_tags", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags |= _object_tags(obj)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_written_tags(session):
+    session.info.pop("cache_tags", None)
+
+
+def written_tags(session=None):
+    """Pop the tags touched by everything flushed in this session so far."""
+    return (session or db.session).info.pop("cache_tags", set())
+
+
+def committed_tags(session=None):
+    """Pop the tags of this session's commits that were already invalidated on commit."""
+    return (session or db.session).info.pop("committed_tags", set())
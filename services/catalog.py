@@ -0,0 +1,158 @@
+"""Read-only catalog snapshot — plain mosque/imam records shared by every public read path.
+
+The snapshot is built from two flat SELECTs, never mutated, and replaced as a
+whole when the catalog generation moves (any worker's mosque/imam write).
+Readers grab the current reference once and keep using it, so a rebuild never
+affects a request that is in flight.
+
+A client that has just written (read-your-writes window, see
+services/invalidation.py) gets a private snapshot loaded for its request
+instead, since the shared one may not have caught up yet.
+"""
+
+import itertools
+import threading
+from collections import namedtuple
+
+from flask import g
+
+from models import Imam, Mosque
+from services.generation import bump_generation, current_generation
+from services.invalidation import read_your_writes_active
+
+MosqueRecord = namedtuple(
+    "MosqueRecord",
+    ("id", "name", "location", "area", "map_link", "latitude", "longitude", "updated_at"),
+)
+ImamRecord = namedtuple(
+    "ImamRecord", ("id", "name", "mosque_id", "audio_sample", "youtube_link", "updated_at")
+)
+
+_catalog = None
+_catalog_version = 0
+_build_lock = threading.Lock()
+# Private snapshots get negative versions so their cache keys never collide with shared ones
+_private_versions = itertools.count(-1, -1)
+
+
+class Catalog:
+    """Immutable mosque/imam snapshot indexed by id, area and location.
+
+    `rows` mirrors the Mosque ⟶ Imam outer join ordered by (mosque name, id),
+    compared in Python so keyset cursors (services/serializers.py) agree: one
+    (mosque, imam) pair per assigned imam, or (mosque, None) for mosques
+    without one. `version` counts this worker's builds (cache keys use it);
+    `generation` is the shared stamp the snapshot was built at.
+    """
+
+    __slots__ = (
+        "version", "generation", "rows", "mosques", "imams", "imam_by_mosque",
+        "rows_by_area", "rows_by_location", "_derived", "_derived_lock",
+    )
+
+    def __init__(self, version, mosques, imams, generation=0):
+        self.version = version
+        self.generation = generation
+        self.mosques = {m.id: m for m in mosques}
+        self.imams = {i.id: i for i in imams}
+
+        imams_by_mosque = {}
+        for imam in imams:
+            if imam.mosque_id is not None:
+                imams_by_mosque.setdefault(imam.mosque_id, []).append(imam)
+        self.imam_by_mosque = {mid: lst[0] for mid, lst in imams_by_mosque.items()}
+
+        rows = []
+        for mosque in mosques:
+            for imam in imams_by_mosque.get(mosque.id) or (None,):
+                rows.append((mosque, imam))
+        self.rows = tuple(rows)
+
+        by_area, by_location = {}, {}
+        for row in self.rows:
+            by_area.setdefault(row[0].area, []).append(row)
+            by_location.setdefault(row[0].location, []).append(row)
+        self.rows_by_area = {k: tuple(v) for k, v in by_area.items()}
+        self.rows_by_location = {k: tuple(v) for k, v in by_location.items()}
+
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def mosque_row(self, mosque_id):
+        """(mosque, imam) for a mosque id, or None if the mosque does not exist."""
+        mosque = self.mosques.get(mosque_id)
+        if mosque is None:
+            return None
+        return mosque, self.imam_by_mosque.get(mosque_id)
+
+    def filter_rows(self, area=None, location=None):
+        """Rows restricted to an area and/or location ("الكل" and "" mean no filter)."""
+        area = area if area and area != "الكل" else None
+        location = location if location and location != "الكل" else None
+        if area and location:
+            return tuple(r for r in self.rows_by_area.get(area, ()) if r[0].location == location)
+        if area:
+            return self.rows_by_area.get(area, ())
+        if location:
+            return self.rows_by_location.get(location, ())
+        return self.rows
+
+    def derived(self, name, factory):
+        """Lazily build a structure derived from this snapshot (search index, coordinates...).
+
+        Derived structures live and die with the snapshot, so they never need
+        their own invalidation.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = factory(self)
+                    self._derived[name] = value
+        return value
+
+
+def _load_catalog(version, generation):
+    mosques = sorted((
+        MosqueRecord(
+            m.id, m.name, m.location, m.area, m.map_link, m.latitude, m.longitude, m.updated_at
+        )
+        for m in Mosque.query.all()
+    ), key=lambda m: (m.name, m.id))
+    imams = [
+        ImamRecord(i.id, i.name, i.mosque_id, i.audio_sample, i.youtube_link, i.updated_at)
+        for i in Imam.query.order_by(Imam.id).all()
+    ]
+    return Catalog(version, mosques, imams, generation)
+
+
+def get_catalog():
+    """Return the current catalog snapshot, (re)building it when the generation has moved."""
+    global _catalog, _catalog_version
+    if read_your_writes_active(catalog=True):
+        catalog = g.get("private_catalog")
+        if catalog is None:
+            catalog = g.private_catalog = _load_catalog(next(_private_versions), current_generation())
+        return catalog
+    generation = current_generation()
+    catalog = _catalog
+    if catalog is not None and catalog.generation == generation:
+        return catalog
+    with _build_lock:
+        if _catalog is None or _catalog.generation != generation:
+            _catalog_version += 1
+            _catalog = _load_catalog(_catalog_version, generation)
+        return _catalog
+
+
+def invalidate_catalog():
+    """Bump the catalog generation and drop this worker's snapshot; the next reader rebuilds it.
+
+    Returns the new generation.
+    """
+    global _catalog
+    generation = bump_generation()
+    with _build_lock:
+        _catalog = None
+    return generation
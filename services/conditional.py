@@ -0,0 +1,91 @@
+"""Conditional GET for JSON endpoints whose data has a cheap version.
+
+`@conditional_get(version_tags)` derives a weak ETag from the request URL
+and the current versions of the cache tags the response depends on (see
+services/cache_tags.py). A matching If-None-Match is answered 304 before the
+view runs, so a polling client whose data has not changed costs a
+tag-version lookup and no database work.
+
+Per-user endpoints pass `private=True`: the bearer token is verified (once
+per request, shared with the auth decorator) and `version_tags` receives
+the caller's Firebase `uid`. Their responses are `Cache-Control: private`
+and vary on Authorization.
+
+Clients inside their read-your-writes window skip the check: their writes
+may not have bumped the tags yet.
+"""
+
+import hashlib
+from functools import wraps
+
+from flask import current_app, request
+
+import auth_utils
+from services.cache import ENCODING_SUFFIXES
+from services.cache_tags import tag_versions
+from services.invalidation import read_your_writes_active
+
+
+def _etag(tags, identity=""):
+    versions = tag_versions(tags)
+    parts = [request.full_path, identity, *(f"{tag}={versions[tag]}" for tag in sorted(versions))]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _matches(etag):
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return any(
+        if_none_match.contains_weak(candidate)
+        for candidate in (etag, *(f"{etag}:{s}" for s in ENCODING_SUFFIXES))
+    )
+
+
+def _with_validators(response, etag, private):
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "private, no-cache" if private else "public, no-cache"
+    response.vary.add("Accept-Encoding")
+    if private:
+        response.vary.add("Authorization")
+    return response
+
+
+def _caller_uid():
+    """Firebase uid of a verified bearer token, or None (the view then reports the auth error)."""
+    token = auth_utils.bearer_token()
+    if not token or not auth_utils.firebase_app:  # read at call time: set by init_firebase()
+        return None
+    try:
+        return auth_utils.verify_request_token(token)["uid"]
+    except Exception:
+        return None
+
+
+def conditional_get(version_tags, private=False):
+    """Answer GETs with 304 while the tags from `version_tags(**view_kwargs)` keep their versions.
+
+    With private=True, `version_tags` is also passed `uid=`.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated(*args, **kwargs):
+            if request.method != "GET" or read_your_writes_active():
+                return view(*args, **kwargs)
+            identity = ""
+            tag_kwargs = kwargs
+            if private:
+                identity = _caller_uid()
+                if identity is None:
+                    return view(*args, **kwargs)
+                tag_kwargs = {**kwargs, "uid": identity}
+            # Computed before the view runs: a write during the build changes the next ETag
+            etag = _etag(version_tags(**tag_kwargs), identity)
+            if _matches(etag):
+                return _with_validators(current_app.response_class(status=304), etag, private)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _with_validators(response, etag, private)
+            return response
+        return decorated
+    return decorator
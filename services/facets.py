@@ -0,0 +1,65 @@
+"""Area → location facets with per-node counts, derived from the catalog snapshot."""
+
+from services.catalog import get_catalog
+
+_COUNTERS = ("mosques", "with_imam", "with_audio")
+
+
+def _empty_counts():
+    return dict.fromkeys(_COUNTERS, 0)
+
+
+class Facets:
+    """Mosque, imam-assigned and audio-available counts per area and per (area, location).
+
+    Counts are per mosque, so a mosque with two imams is counted once.
+    """
+
+    __slots__ = ("tree", "area_counts", "total")
+
+    def __init__(self, catalog):
+        tree, area_counts, total = {}, {}, _empty_counts()
+        for mosque_id, mosque in catalog.mosques.items():
+            imam = catalog.imam_by_mosque.get(mosque_id)
+            node = tree.setdefault(mosque.area, {}).setdefault(mosque.location, _empty_counts())
+            for counts in (node, area_counts.setdefault(mosque.area, _empty_counts()), total):
+                counts["mosques"] += 1
+                if imam is not None:
+                    counts["with_imam"] += 1
+                    if imam.audio_sample:
+                        counts["with_audio"] += 1
+        self.tree = tree
+        self.area_counts = area_counts
+        self.total = total
+
+    def areas(self):
+        """Sorted, non-empty area names."""
+        return sorted(a for a in self.tree if a)
+
+    def locations(self, area=None):
+        """Sorted, distinct non-empty locations, optionally within one area ("الكل" = all)."""
+        if area and area != "الكل":
+            return sorted(loc for loc in self.tree.get(area, {}) if loc)
+        return sorted({loc for locations in self.tree.values() for loc in locations if loc})
+
+    def as_payload(self):
+        """JSON shape of /api/facets: areas and their locations, each with counts, sorted by name."""
+        return {
+            "total": self.total,
+            "areas": [
+                dict(
+                    self.area_counts[area],
+                    area=area,
+                    locations=[
+                        dict(self.tree[area][loc], location=loc)
+                        for loc in sorted(l for l in self.tree[area] if l)
+                    ],
+                )
+                for area in self.areas()
+            ],
+        }
+
+
+def get_facets():
+    """Facets for the current catalog snapshot (rebuilt with the snapshot)."""
+    return get_catalog().derived("facets", Facets)
@@ -0,0 +1,113 @@
+"""Catalog generation stamp — bumped on every mosque/imam write, shared by all workers via Redis.
+
+Process-local structures (the catalog snapshot and everything derived from
+it) remember the generation they were built at and rebuild when it moves.
+Reading the stamp costs one Redis GET at most every GENERATION_CHECK_INTERVAL
+seconds per worker. Without Redis (unset, or breaker open) the counter is
+process-local, so each worker also polls a database stamp — row count and
+latest updated_at of mosques and imams — at the same interval and bumps its
+counter when that moves: other workers' writes still reach it.
+
+Generations are compared for equality only, and the two counters are
+independent, so each value names its source ("redis:<n>" / "local:<n>"): a
+worker switching between them always rebuilds. The Redis counter starts from
+the current time in milliseconds whenever the key is missing, so a Redis
+restart or flush never hands out a value a worker has already seen.
+"""
+
+import threading
+import time
+
+from flask import has_app_context
+from sqlalchemy import func
+
+from models import Imam, Mosque, db
+from services.redis_client import redis_get, redis_is_available, redis_pipeline
+
+GENERATION_KEY = "catalog:generation"  # outside taraweeh:* so cache flushes never reset it
+GENERATION_CHECK_INTERVAL = 2.0  # seconds a worker trusts its last reading
+
+# In-memory fallback (used when Redis is unavailable)
+_local_generation = 0
+_db_stamp = None
+
+_last_seen = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_generation(fresh=False):
+    """The latest catalog generation, re-read from Redis at most once per check interval.
+
+    fresh=True re-reads it now (one Redis GET, or the database stamp).
+    """
+    global _last_seen, _checked_at
+    now = time.monotonic()
+    if not fresh and _last_seen is not None and now - _checked_at < GENERATION_CHECK_INTERVAL:
+        return _last_seen
+    value = redis_get(GENERATION_KEY) if redis_is_available() else None
+    stamp = _read_db_stamp() if value is None and has_app_context() else None
+    with _lock:
+        if value is None:
+            _follow_db_stamp(stamp)
+        _last_seen = _redis_generation(value) if value is not None else _local()
+        _checked_at = now
+        return _last_seen
+
+
+def _redis_generation(value):
+    return f"redis:{value}"
+
+
+def _local():
+    return f"local:{_local_generation}"
+
+
+def _read_db_stamp():
+    """(row count, latest updated_at) of the mosque and imam tables."""
+    return tuple(
+        tuple(db.session.query(func.count(model.id), func.max(model.updated_at)).one())
+        for model in (Mosque, Imam)
+    )
+
+
+def _follow_db_stamp(stamp):
+    """Bump the local generation when the database stamp moved since the last reading (lock held)."""
+    global _local_generation, _db_stamp
+    if stamp is None:
+        return
+    if _db_stamp is not None and stamp != _db_stamp:
+        _local_generation += 1
+    _db_stamp = stamp
+
+
+def bump_generation(observe=True):
+    """Mark the catalog as changed, for this worker immediately and for the others within the interval.
+
+    observe=False leaves this worker's reading alone until `observe_generation`
+    (or the next check) picks the new value up.
+    """
+    global _local_generation, _last_seen, _checked_at, _db_stamp
+    # A missing key (Redis restarted or flushed) restarts from now, above anything handed out before
+    results = redis_pipeline(
+        ("set", GENERATION_KEY, int(time.time() * 1000), None, None, True), ("incr", GENERATION_KEY),
+    )
+    value = results[1] if results is not None else None
+    with _lock:
+        _local_generation += 1
+        generation = _redis_generation(value) if value is not None else _local()
+        if value is None:
+            # Re-take the database stamp before the next build, so our own write is not counted twice
+            _db_stamp = None
+        if observe:
+            _last_seen = generation
+            _checked_at = time.monotonic() if value is not None else 0.0
+        return generation
+
+
+def observe_generation(value):
+    """Adopt a generation announced by another worker without waiting for the next check."""
+    global _last_seen, _checked_at
+    with _lock:
+        _last_seen = value
+        _checked_at = time.monotonic()
@@ -0,0 +1,236 @@
+"""Cross-worker invalidation bus — Redis pub/sub with generation polling as the fallback.
+
+`invalidate_caches()` in one gunicorn worker bumps the catalog generation
+and/or cache tag versions and announces them on INVALIDATION_CHANNEL. Every
+worker runs one daemon listener thread that, on an announcement, adopts the
+new tag versions and generation (so its catalog snapshot and derived indexes
+rebuild on next use) and runs the registered handlers that drop its
+process-local caches.
+
+When pub/sub is unavailable (or a message was missed during a reconnect),
+the same thread polls the shared generation every POLL_INTERVAL seconds, so
+workers still converge — just within a second or two instead of immediately.
+Without Redis at all that generation follows a database stamp (see
+services/generation.py), which is why the thread runs in an app context.
+
+Writes are announced with a short delay (see cache.invalidate_written), so the
+writer gets a read-your-writes cookie: for a few seconds its requests skip
+conditional-GET revalidation and, after a mosque/imam write, the catalog
+snapshot and response cache, on whichever worker they land. The cookie is
+signed, expires with RW_WINDOW, and only counts for requests authenticated
+as the user who wrote.
+"""
+
+import os
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+import auth_utils
+
+from services.cache_tags import observe_tags
+from services.generation import current_generation, observe_generation
+from services.redis_client import decode_value, redis_publish, redis_subscribe
+
+INVALIDATION_CHANNEL = "catalog:invalidations"
+POLL_INTERVAL = 1.0  # seconds between generation polls / pub/sub reads
+RECONNECT_DELAY = 5.0  # seconds before re-subscribing after a pub/sub failure
+
+_handlers = []
+_applied_generation = None
+_apply_lock = threading.Lock()
+
+# Read-your-writes: covers the debounce window plus time for other workers to catch up
+RW_COOKIE = "taraweeh_rw"
+RW_WINDOW = 5
+RW_SALT = "read-your-writes"
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def register_invalidation_handler(handler):
+    """Call `handler()` in this worker whenever another worker invalidates the catalog."""
+    _handlers.append(handler)
+    return handler
+
+
+def _apply(generation):
+    """Run the handlers once per generation change seen by this worker."""
+    global _applied_generation
+    with _apply_lock:
+        if generation == _applied_generation:
+            return
+        first = _applied_generation is None
+        _applied_generation = generation
+    observe_generation(generation)
+    if first:
+        return
+    for handler in _handlers:
+        try:
+            handler()
+        except Exception as e:
+            print(f"Invalidation handler failed: {e}")
+
+
+def mark_applied(generation):
+    """Record a generation this worker has already invalidated locally (it published it)."""
+    global _applied_generation
+    with _apply_lock:
+        _applied_generation = generation
+
+
+def publish_invalidation(generation=None, tags=None):
+    """Tell every other worker that the catalog moved to `generation` and/or tags were bumped."""
+    if generation is not None:
+        mark_applied(generation)
+    redis_publish(INVALIDATION_CHANNEL, {"generation": generation, "tags": tags or {}})
+
+
+def _apply_message(message):
+    if message.get("tags"):
+        observe_tags(message["tags"])
+    if message.get("generation") is not None:
+        _apply(message["generation"])
+
+
+def _close(pubsub):
+    try:
+        pubsub.close()
+    except Exception:
+        pass
+
+
+def _listen(app):
+    pubsub = None
+    subscribe_at = 0.0
+    while True:
+        try:
+            if pubsub is None and time.monotonic() >= subscribe_at:
+                pubsub = redis_subscribe(INVALIDATION_CHANNEL)
+                subscribe_at = time.monotonic() + RECONNECT_DELAY
+            if pubsub is not None:
+                message = pubsub.get_message(timeout=POLL_INTERVAL)
+                if message and message["type"] == "message":
+                    _apply_message(decode_value(message["data"]) or {})
+                    continue
+            else:
+                time.sleep(POLL_INTERVAL)
+            # Polling fallback: catches messages missed while (re)subscribing, and is
+            # the only path when pub/sub is unavailable
+            with app.app_context():
+                _apply(current_generation())
+        except Exception as e:
+            print(f"Invalidation listener error, resubscribing: {e}")
+            if pubsub is not None:
+                _close(pubsub)
+                pubsub = None
+            time.sleep(POLL_INTERVAL)
+
+
+def start_invalidation_listener(app):
+    """Start this worker's listener thread (once per process — safe after a fork)."""
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        thread = threading.Thread(target=_listen, args=(app,), name="cache-invalidation", daemon=True)
+        thread.start()
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt=RW_SALT)
+
+
+def _request_identity():
+    """Who the current request is authenticated as: "uid:<firebase uid>", "admin:<id>" or None."""
+    decoded = g.get("firebase_decoded")
+    if decoded is None:
+        token = auth_utils.bearer_token()
+        if token and auth_utils.firebase_app:
+            try:
+                decoded = auth_utils.verify_request_token(token)
+            except Exception:
+                decoded = None
+    if decoded:
+        return f"uid:{decoded['uid']}"
+    if current_user and current_user.is_authenticated:
+        return f"admin:{current_user.get_id()}"
+    return None
+
+
+def _cookie_grant():
+    """(until, catalog) from a valid read-your-writes cookie, or None."""
+    raw = request.cookies.get(RW_COOKIE)
+    if not raw:
+        return None
+    try:
+        grant = _serializer().loads(raw, max_age=RW_WINDOW)
+    except BadSignature:
+        return None
+    now = time.time()
+    if not isinstance(grant, dict) or not now < grant.get("until", 0) <= now + RW_WINDOW:
+        return None
+    if grant.get("who") != _request_identity():
+        return None
+    return grant["until"], bool(grant.get("catalog"))
+
+
+def mark_writer(catalog=False):
+    """Flag the current request's client as a writer whose next reads must bypass shared caches.
+
+    With catalog=True (mosque/imam writes) the bypass also covers the catalog
+    snapshot and response cache; otherwise only conditional-GET revalidation.
+    """
+    if not has_request_context():
+        return
+    who = _request_identity()
+    if who is None:
+        return
+    current = g.get("read_your_writes") or _cookie_grant()
+    catalog = catalog or bool(current and current[1])
+    g.read_your_writes = (time.time() + RW_WINDOW, catalog, who)
+
+
+def read_your_writes_active(catalog=False):
+    """True while the current request comes from a client that wrote within RW_WINDOW seconds.
+
+    catalog=True asks whether that write touched the catalog.
+    """
+    if not has_request_context():
+        return False
+    grant = g.get("read_your_writes")
+    if grant is None:
+        grant = g.get("_rw_grant", False)
+        if grant is False:
+            grant = g._rw_grant = _cookie_grant()
+    if grant is None:
+        return False
+    return grant[1] or not catalog
+
+
+def set_read_your_writes_cookie(response):
+    """after_request hook: hand the writer its signed bypass cookie."""
+    grant = g.get("read_your_writes")
+    if grant:
+        until, catalog, who = grant
+        value = _serializer().dumps({"until": until, "catalog": catalog, "who": who})
+        response.set_cookie(
+            RW_COOKIE, value, max_age=RW_WINDOW, httponly=True, samesite="Lax",
+            secure=not current_app.debug,
+        )
+    return response
+
+
+def clear_read_your_writes(exc=None):
+    """teardown_request hook: the writer flag and private catalog belong to one request."""
+    g.pop("read_your_writes", None)
+    g.pop("_rw_grant", None)
+    g.pop("private_catalog", None)
@@ -0,0 +1,44 @@
+"""Flask JSON provider that encodes with orjson when it is installed.
+
+Responses are compact, key-sorted UTF-8 (`ensure_ascii=False`): Arabic text
+goes out as 2 bytes a letter instead of a 6-byte \\uXXXX escape. With orjson
+the body bytes are written straight into the response; without it the
+stdlib encoder produces the same bytes (short of exponent-form floats:
+orjson writes 1e-7 where json writes 1e-07), so the fallback is a drop-in.
+
+Types orjson does not handle the way Flask does (dates as HTTP dates,
+Decimal, objects with __html__) go through Flask's usual `default`. Indented
+output (debug mode) uses the stdlib path, as does `dumps` (templates'
+`tojson`), whose ", "/": " separators orjson cannot produce.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME  # Flask sends dates as HTTP dates, not ISO 8601
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.ensure_ascii or self.compact is False or (
+            self.compact is None and self._app.debug
+        ):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        options = _ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        body = orjson.dumps(obj, default=self.default, option=options)
+        return self._app.response_class(body, mimetype=self.mimetype)
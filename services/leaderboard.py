@@ -0,0 +1,203 @@
+"""Contribution leaderboard — Redis sorted sets (all-time + per season) with in-memory fallback.
+
+The database stays the source of truth. Each board is mirrored from it on
+first use and re-mirrored every RESEED_TTL seconds; in between, approvals bump
+the mirrored score with ZINCRBY so reads never scan the users table.
+
+Without Redis each worker keeps its own boards and only sees its own
+approvals directly (there is no invalidation bus either), so local boards are
+re-mirrored every LOCAL_RESEED_TTL seconds instead.
+"""
+
+import datetime
+import threading
+import time
+
+from models import CommunityRequest, ImamTransferRequest, PublicUser, db
+from services.cache import invalidate_written
+from services.cache_tags import user_tags
+from services.redis_client import (
+    redis_delete, redis_get, redis_is_available, redis_mget, redis_pipeline, redis_set,
+    redis_zincrby, redis_zreplace, redis_zrevrange,
+)
+
+LEADERBOARD_PREFIX = "leaderboard:"
+PIONEER_KEY = LEADERBOARD_PREFIX + "pioneer"
+RESEED_TTL = 3600  # hourly re-mirror heals increments that raced a reseed
+LOCAL_RESEED_TTL = 10  # in-memory boards: how stale other workers' approvals may get
+PIONEER_TTL = 30 * 86400  # the first approval never changes; keep it for the season
+
+# In-memory fallback (used when Redis is unavailable)
+_local_boards = {}  # board key -> {user_id: points}
+_local_seeded_until = {}  # board key -> unix time
+_local_pioneer = None
+_local_lock = threading.Lock()
+
+
+def current_season(now=None):
+    """Season id: the Gregorian year this Ramadan falls in."""
+    return str((now or datetime.datetime.utcnow()).year)
+
+
+def _board_key(season):
+    return LEADERBOARD_PREFIX + (f"season:{season}" if season else "all")
+
+
+def _load_scores(season):
+    """Ground-truth {user_id: points} for a board, straight from the database."""
+    if not season:
+        rows = db.session.query(PublicUser.id, PublicUser.contribution_points).filter(
+            PublicUser.contribution_points > 0
+        ).all()
+        return {uid: points for uid, points in rows}
+
+    start = datetime.datetime(int(season), 1, 1)
+    end = datetime.datetime(int(season) + 1, 1, 1)
+    scores = {}
+    for model in (CommunityRequest, ImamTransferRequest):
+        rows = db.session.query(model.submitter_id, db.func.count(model.id)).filter(
+            model.status == "approved",
+            model.reviewed_at >= start,
+            model.reviewed_at < end,
+        ).group_by(model.submitter_id).all()
+        for uid, count in rows:
+            scores[uid] = scores.get(uid, 0) + count
+    return scores
+
+
+def _ensure_board(season):
+    """Mirror a board from the DB if it is missing or due for a reseed. Returns (key, use_redis)."""
+    key = _board_key(season)
+    if redis_is_available():
+        if redis_get(key + ":seeded") is None:
+            scores = _load_scores(season)
+            redis_zreplace(key, {str(uid): points for uid, points in scores.items()})
+            redis_set(key + ":seeded", 1, ttl=RESEED_TTL)
+        return key, True
+
+    with _local_lock:
+        if _local_seeded_until.get(key, 0) > time.time():
+            return key, False
+    scores = _load_scores(season)
+    with _local_lock:
+        _local_boards[key] = scores
+        _local_seeded_until[key] = time.time() + LOCAL_RESEED_TTL
+    return key, False
+
+
+def _local_sorted(key):
+    with _local_lock:
+        board = dict(_local_boards.get(key, {}))
+    return sorted(board.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def top(offset=0, limit=20, season=None):
+    """[(user_id, points)] ordered by points, highest first."""
+    key, use_redis = _ensure_board(season)
+    if use_redis:
+        rows = redis_zrevrange(key, offset, offset + limit - 1)
+        if rows is not None:
+            return [(int(member), int(score)) for member, score in rows]
+    return _local_sorted(key)[offset:offset + limit]
+
+
+def rank_of(user_id, season=None):
+    """(1-based rank, points) for a user, or None if they have no points on this board."""
+    key, use_redis = _ensure_board(season)
+    if use_redis:
+        member = str(user_id)
+        results = redis_pipeline(("zrevrank", key, member), ("zscore", key, member))
+        if results is not None:
+            rank, score = results
+            if rank is None:
+                return None
+            return rank + 1, int(score or 0)
+    for pos, (uid, points) in enumerate(_local_sorted(key)):
+        if uid == user_id:
+            return pos + 1, points
+    return None
+
+
+def around(user_id, radius=2, season=None):
+    """A user's (rank, points) plus [(rank, user_id, points)] for the users around them."""
+    mine = rank_of(user_id, season)
+    if mine is None:
+        return None, []
+    start = max(0, mine[0] - 1 - radius)
+    rows = top(start, 2 * radius + 1, season)
+    return mine, [(start + i + 1, uid, points) for i, (uid, points) in enumerate(rows)]
+
+
+def award_points(user_id, amount=1, now=None):
+    """Mirror a committed contribution_points increment into the all-time and season boards.
+
+    Boards that are not mirrored yet are skipped; they pick the points up from
+    the database when they are seeded. Approvals add the points with a raw
+    UPDATE the cache tag collector never sees, so the leaderboard and the
+    user's own tags are invalidated here.
+    """
+    keys = [_board_key(season) for season in (None, current_season(now))]
+    if redis_is_available():
+        seeded = redis_mget([key + ":seeded" for key in keys])
+        for key, flag in zip(keys, seeded):
+            if flag is not None:
+                redis_zincrby(key, amount, str(user_id))
+    else:
+        for key in keys:
+            with _local_lock:
+                board = _local_boards.get(key)
+                if board is not None and _local_seeded_until.get(key, 0) > time.time():
+                    board[user_id] = board.get(user_id, 0) + amount
+
+    user = db.session.get(PublicUser, user_id)  # already in the session after an approval
+    invalidate_written("leaderboard", *(user_tags(user) if user else ()))
+
+
+def pioneer_id():
+    """Submitter of the first approved contribution (legacy transfers or community requests)."""
+    global _local_pioneer
+    if redis_is_available():
+        cached = redis_get(PIONEER_KEY)
+        if cached is not None:
+            return cached
+    elif _local_pioneer is not None:
+        return _local_pioneer
+
+    legacy_pioneer = db.session.query(
+        ImamTransferRequest.submitter_id, ImamTransferRequest.reviewed_at
+    ).filter(
+        ImamTransferRequest.status == "approved"
+    ).order_by(ImamTransferRequest.reviewed_at.asc()).first()
+
+    community_pioneer = db.session.query(
+        CommunityRequest.submitter_id, CommunityRequest.reviewed_at
+    ).filter(
+        CommunityRequest.status == "approved"
+    ).order_by(CommunityRequest.reviewed_at.asc()).first()
+
+    pioneer = None
+    if legacy_pioneer and community_pioneer:
+        pioneer = legacy_pioneer[0] if legacy_pioneer[1] <= community_pioneer[1] else community_pioneer[0]
+    elif legacy_pioneer:
+        pioneer = legacy_pioneer[0]
+    elif community_pioneer:
+        pioneer = community_pioneer[0]
+
+    # Only a found pioneer is final; until the first approval, keep asking the DB
+    if pioneer is not None:
+        redis_set(PIONEER_KEY, pioneer, ttl=PIONEER_TTL)
+        _local_pioneer = pioneer
+    return pioneer
+
+
+def reset_leaderboard():
+    """Forget every mirrored board and the pioneer so they are rebuilt from the database."""
+    global _local_pioneer
+    with _local_lock:
+        keys = list(_local_boards)
+        _local_boards.clear()
+        _local_seeded_until.clear()
+        _local_pioneer = None
+    for season in (None, current_season()):
+        keys.append(_board_key(season))
+    redis_delete(PIONEER_KEY, *(k + ":seeded" for k in keys))
@@ -0,0 +1,104 @@
+"""Mosque search index — character n-gram posting lists stored as integer bitsets.
+
+Every catalog row gets a bit position (its index in `catalog.rows`, which is
+already ordered by mosque name). Posting lists, area filters and location
+filters are plain Python ints used as bitsets, so narrowing a query down is a
+handful of big-int ANDs instead of a pass over every row. Candidates are then
+confirmed with the same normalized substring test the endpoint always used.
+"""
+
+from services.catalog import get_catalog
+from utils import normalize_arabic, normalize_arabic_many
+
+GRAM_SIZE = 3
+
+
+def _grams(text):
+    """All n-grams of length 1..GRAM_SIZE in a normalized string."""
+    grams = set()
+    n = len(text)
+    for size in range(1, GRAM_SIZE + 1):
+        for i in range(n - size + 1):
+            grams.add(text[i:i + size])
+    return grams
+
+
+def _query_grams(text):
+    """The grams every matching field must contain: trigrams, or the whole query if shorter."""
+    if len(text) <= GRAM_SIZE:
+        return {text}
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _iter_bits(mask):
+    """Yield set bit positions in ascending order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class MosqueSearchIndex:
+    """Inverted n-gram index over normalized mosque name, location and imam name."""
+
+    __slots__ = ("rows", "fields", "postings", "area_bits", "location_bits", "all_bits")
+
+    def __init__(self, catalog):
+        self.rows = catalog.rows
+        self.fields = []
+        postings, area_bits, location_bits = {}, {}, {}
+        names = normalize_arabic_many(m.name for m, _ in self.rows)
+        locations = normalize_arabic_many(m.location for m, _ in self.rows)
+        imam_names = normalize_arabic_many(i.name if i else "" for _, i in self.rows)
+        for pos, (mosque, imam) in enumerate(self.rows):
+            bit = 1 << pos
+            fields = (names[pos], locations[pos], imam_names[pos])
+            self.fields.append(fields)
+            grams = set()
+            for field in fields:
+                grams |= _grams(field)
+            for gram in grams:
+                postings[gram] = postings.get(gram, 0) | bit
+            area_bits[mosque.area] = area_bits.get(mosque.area, 0) | bit
+            location_bits[mosque.location] = location_bits.get(mosque.location, 0) | bit
+        self.postings = postings
+        self.area_bits = area_bits
+        self.location_bits = location_bits
+        self.all_bits = (1 << len(self.rows)) - 1
+
+    def filter_bits(self, area=None, location=None):
+        mask = self.all_bits
+        if area and area != "الكل":
+            mask &= self.area_bits.get(area, 0)
+        if location and location != "الكل":
+            mask &= self.location_bits.get(location, 0)
+        return mask
+
+    def search(self, query, area=None, location=None):
+        """Rows whose normalized name, location or imam name contains the query, in name order."""
+        mask = self.filter_bits(area, location)
+        normalized_query = normalize_arabic(query) if query else ""
+        if not normalized_query:
+            return [self.rows[pos] for pos in _iter_bits(mask)]
+
+        # Rarest posting lists first so the mask empties as early as possible
+        for gram in sorted(_query_grams(normalized_query), key=lambda g: self.postings.get(g, 0).bit_count()):
+            mask &= self.postings.get(gram, 0)
+            if not mask:
+                return []
+
+        result = []
+        for pos in _iter_bits(mask):
+            name, location_norm, imam_name = self.fields[pos]
+            if (
+                normalized_query in name
+                or normalized_query in location_norm
+                or normalized_query in imam_name
+            ):
+                result.append(self.rows[pos])
+        return result
+
+
+def get_mosque_search_index():
+    """Search index for the current catalog snapshot (rebuilt with the snapshot)."""
+    return get_catalog().derived("mosque_search", MosqueSearchIndex)
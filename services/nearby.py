@@ -0,0 +1,97 @@
+"""Nearby mosque engine — vectorized haversine pre-ranking, exact geodesic on final candidates."""
+
+import numpy as np
+from geopy.distance import geodesic
+
+from services.catalog import get_catalog
+from services.serializers import serialize_mosque
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Spherical haversine and WGS-84 geodesic disagree by at most ~0.56% in either
+# direction, so a candidate cut at (1.0056)^2 of the k-th haversine distance
+# can never drop a mosque that belongs in the exact geodesic top-k.
+_HAVERSINE_TOLERANCE = 1.012
+_ROUNDING_SLACK_KM = 0.01
+
+
+class NearbyIndex:
+    """Contiguous coordinate arrays + pre-serialized rows for every mosque with coordinates."""
+
+    __slots__ = ("rows", "coords", "lat_rad", "lng_rad", "cos_lat", "areas", "has_audio")
+
+    def __init__(self, catalog):
+        pairs = [
+            (m, i) for m, i in catalog.rows
+            if m.latitude is not None and m.longitude is not None
+        ]
+        n = len(pairs)
+        self.rows = [serialize_mosque(m, imam=i) for m, i in pairs]
+        self.coords = [(m.latitude, m.longitude) for m, _ in pairs]
+        lat = np.fromiter((m.latitude for m, _ in pairs), dtype=np.float64, count=n)
+        lng = np.fromiter((m.longitude for m, _ in pairs), dtype=np.float64, count=n)
+        self.lat_rad = np.radians(lat)
+        self.lng_rad = np.radians(lng)
+        self.cos_lat = np.cos(self.lat_rad)
+        self.areas = np.array([m.area for m, _ in pairs], dtype=object)
+        self.has_audio = np.fromiter(
+            (bool(i and i.audio_sample) for _, i in pairs), dtype=bool, count=n
+        )
+
+    def __len__(self):
+        return len(self.rows)
+
+    def haversine_km(self, lat, lng, idx):
+        """Great-circle distance (km) from (lat, lng) to the mosques at positions idx."""
+        lat1 = np.radians(lat)
+        dlat = self.lat_rad[idx] - lat1
+        dlng = self.lng_rad[idx] - np.radians(lng)
+        a = np.sin(dlat * 0.5) ** 2 + np.cos(lat1) * self.cos_lat[idx] * np.sin(dlng * 0.5) ** 2
+        return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def get_nearby_index():
+    """Coordinate arrays for the current catalog snapshot (rebuilt with the snapshot)."""
+    return get_catalog().derived("nearby", NearbyIndex)
+
+
+def find_nearby(lat, lng, limit=None, radius_km=None, area=None, has_audio=False):
+    """Return serialized mosques sorted by geodesic distance from (lat, lng).
+
+    Haversine distances for the whole catalog are computed in one vectorized
+    pass; only the rows that can still make the cut (top `limit`, within
+    `radius_km`) get an exact geodesic distance.
+    """
+    index = get_nearby_index()
+    if not len(index):
+        return []
+
+    mask = np.ones(len(index), dtype=bool)
+    if area and area != "الكل":
+        mask &= index.areas == area
+    if has_audio:
+        mask &= index.has_audio
+    idx = np.flatnonzero(mask)
+    if not idx.size:
+        return []
+
+    hav = index.haversine_km(lat, lng, idx)
+    if radius_km is not None:
+        keep = hav <= radius_km * _HAVERSINE_TOLERANCE + _ROUNDING_SLACK_KM
+        idx, hav = idx[keep], hav[keep]
+    if limit is not None and limit < idx.size:
+        kth = np.partition(hav, limit - 1)[limit - 1]
+        keep = hav <= kth * _HAVERSINE_TOLERANCE + _ROUNDING_SLACK_KM
+        idx = idx[keep]
+
+    user_location = (lat, lng)
+    scored = []
+    for i in idx.tolist():
+        distance = geodesic(user_location, index.coords[i]).kilometers
+        if radius_km is not None and distance > radius_km:
+            continue
+        scored.append((round(distance, 2), i))
+    scored.sort()
+    if limit is not None:
+        scored = scored[:limit]
+    return [dict(index.rows[i], distance=d) for d, i in scored]
@@ -1,16 +1,58 @@
-"""Redis client with connection pooling and graceful fallback."""
+"""Redis client with connection pooling, a circuit breaker and graceful fallback.
+
+Every call goes through `_call`, which consults the breaker first:
+
+- closed: calls go to Redis; FAILURE_THRESHOLD consecutive errors open it.
+- open: calls fail fast (return their fallback) without touching the socket.
+  A background thread pings Redis every RECONNECT_INTERVAL seconds.
+- half-open: that thread's ping is the single trial call; success closes the
+  breaker, failure re-opens it.
+
+So a Redis that is down (at boot or mid-flight) costs a few timed-out calls,
+then microseconds per call until it is back. `redis_breaker_state()` exports
+the breaker for the admin dashboard.
+
+The connection returns raw bytes. Values go through `encode_value` /
+`decode_value` (orjson when installed, stdlib json otherwise — both produce
+the same compact UTF-8 JSON), while `redis_get_raw` / `redis_set_raw` move
+pre-encoded bytes untouched. `redis_mget` and `redis_pipeline` batch several
+keys or commands into one round trip.
+"""
 
 import json
 import os
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is the fallback
+    orjson = None
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+DISABLED = "disabled"  # REDIS_URL unset or redis-py unusable: in-memory fallback for good
+
+FAILURE_THRESHOLD = 3  # consecutive failures before the breaker opens
+RECONNECT_INTERVAL = 5.0  # seconds between background reconnect attempts while open
 
 _redis_client = None
-_redis_available = False
 _init_attempted = False
+_init_lock = threading.Lock()
+
+_state = DISABLED
+_failures = 0
+_breaker_lock = threading.Lock()
+_breaker_stats = {
+    "trips": 0, "short_circuited": 0, "reconnects": 0, "opened_at": None, "last_error": None,
+}
+_reconnector_pid = None
 
 
 def _init_redis():
     """Initialize Redis connection pool. Called lazily on first use."""
-    global _redis_client, _redis_available, _init_attempted
+    global _redis_client, _init_attempted
     _init_attempted = True
     redis_url = os.environ.get("REDIS_URL")
     if not redis_url:
@@ -28,82 +70,295 @@ def _init_redis():
 
         _redis_client = redis_lib.Redis.from_url(
             redis_url,
-            decode_responses=True,
+            decode_responses=False,
             max_connections=10,
             socket_timeout=2,
             socket_connect_timeout=2,
             health_check_interval=30,
             **ssl_kwargs,
         )
+    except Exception as e:
+        print(f"Redis client could not be created, falling back to in-memory: {e}")
+        _redis_client = None
+        return
+
+    try:
         _redis_client.ping()
-        _redis_available = True
+        _close_breaker()
         print("Redis connected successfully")
     except Exception as e:
-        print(f"Redis connection failed, falling back to in-memory: {e}")
-        _redis_client = None
-        _redis_available = False
+        # Not fatal: the reconnect thread keeps trying and closes the breaker once Redis is up
+        print(f"Redis connection failed, falling back to in-memory until it recovers: {e}")
+        _trip(e)
 
 
 def _ensure_init():
     """Ensure Redis has been initialized (lazy init on first call)."""
     if not _init_attempted:
-        _init_redis()
+        with _init_lock:
+            if not _init_attempted:
+                _init_redis()
 
 
-def redis_get(key):
-    """Get a value from Redis. Returns None if unavailable or missing."""
+# --- circuit breaker ---
+
+def _close_breaker():
+    global _state, _failures
+    with _breaker_lock:
+        _state = CLOSED
+        _failures = 0
+
+
+def _trip(error):
+    """Open the breaker and make sure this process has a reconnect thread."""
+    global _state
+    with _breaker_lock:
+        if _state != OPEN:
+            _state = OPEN
+            _breaker_stats["trips"] += 1
+            _breaker_stats["opened_at"] = time.time()
+        _breaker_stats["last_error"] = str(error)
+    _start_reconnector()
+
+
+def _record_failure(error):
+    global _failures
+    with _breaker_lock:
+        _failures += 1
+        _breaker_stats["last_error"] = str(error)
+        tripped = _state == CLOSED and _failures >= FAILURE_THRESHOLD
+    if tripped:
+        print(f"Redis failing ({error}), opening circuit breaker")
+        _trip(error)
+
+
+def _record_success():
+    global _failures
+    if _failures:
+        with _breaker_lock:
+            _failures = 0
+
+
+def _probe():
+    """One half-open trial: ping Redis and close or re-open the breaker. True if Redis is back."""
+    global _state
+    with _breaker_lock:
+        if _state != OPEN:
+            return _state == CLOSED
+        _state = HALF_OPEN
+    try:
+        _redis_client.ping()
+    except Exception as e:
+        with _breaker_lock:
+            _state = OPEN
+            _breaker_stats["last_error"] = str(e)
+        return False
+    _close_breaker()
+    with _breaker_lock:
+        _breaker_stats["reconnects"] += 1
+    print("Redis reconnected, circuit breaker closed")
+    return True
+
+
+def _reconnect_loop():
+    global _reconnector_pid
+    while True:
+        time.sleep(RECONNECT_INTERVAL)
+        if _probe():
+            with _breaker_lock:
+                # Exit unless a failure slipped in between closing and here
+                if _state == CLOSED:
+                    _reconnector_pid = None
+                    return
+
+
+def _start_reconnector():
+    """Start the reconnect thread (once per process — threads do not survive a fork)."""
+    global _reconnector_pid
+    pid = os.getpid()
+    with _breaker_lock:
+        if _reconnector_pid == pid:
+            return
+        _reconnector_pid = pid
+    threading.Thread(target=_reconnect_loop, name="redis-reconnect", daemon=True).start()
+
+
+def _call(default, operation):
+    """Run `operation(client)` behind the breaker, returning `default` if Redis is unusable."""
     _ensure_init()
-    if not _redis_available:
-        return None
+    if _state != CLOSED:
+        if _state != DISABLED:
+            with _breaker_lock:
+                _breaker_stats["short_circuited"] += 1
+            if _reconnector_pid != os.getpid():  # forked after the breaker opened
+                _start_reconnector()
+        return default
     try:
-        val = _redis_client.get(key)
-        if val is not None:
-            return json.loads(val)
+        result = operation(_redis_client)
+    except Exception as e:
+        _record_failure(e)
+        return default
+    _record_success()
+    return result
+
+
+def redis_breaker_state():
+    """Breaker state and counters, for the admin dashboard."""
+    _ensure_init()
+    with _breaker_lock:
+        return {"state": _state, "consecutive_failures": _failures, **_breaker_stats}
+
+
+# --- codec ---
+
+def encode_value(value):
+    """JSON-encode a value to compact UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_value(data):
+    """Inverse of encode_value; None for missing or undecodable data."""
+    if data is None:
         return None
-    except Exception:
+    try:
+        return orjson.loads(data) if orjson is not None else json.loads(data)
+    except ValueError:
         return None
 
 
+def _text(data):
+    return data.decode("utf-8") if isinstance(data, bytes) else data
+
+
+# --- key/value ---
+
+def redis_get(key):
+    """Get a value from Redis. Returns None if unavailable or missing."""
+    return decode_value(_call(None, lambda r: r.get(key)))
+
+
+def redis_get_raw(key):
+    """The stored bytes of a key, undecoded. None if unavailable or missing."""
+    return _call(None, lambda r: r.get(key))
+
+
+def redis_mget(keys):
+    """Decoded values of several keys in one round trip ([None] * len(keys) if unavailable)."""
+    return [decode_value(v) for v in redis_mget_raw(keys)]
+
+
+def redis_mget_raw(keys):
+    """Stored bytes of several keys in one round trip ([None] * len(keys) if unavailable)."""
+    keys = list(keys)
+    if not keys:
+        return []
+    return _call(None, lambda r: r.mget(keys)) or [None] * len(keys)
+
+
 def redis_set(key, value, ttl=300):
     """Set a value in Redis with TTL (default 5 minutes). Fails silently."""
-    _ensure_init()
-    if not _redis_available:
-        return
-    try:
-        _redis_client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
-    except Exception:
-        pass
+    _call(None, lambda r: r.set(key, encode_value(value), ex=ttl))
+
+
+def redis_set_raw(key, data, ttl=300):
+    """Store pre-encoded bytes with TTL. Fails silently."""
+    _call(None, lambda r: r.set(key, data, ex=ttl))
+
+
+def redis_set_nx(key, value, ttl):
+    """Set a key only if it does not exist (a lock). True if set, False if taken, None if unavailable."""
+    return _call(None, lambda r: bool(r.set(key, encode_value(value), nx=True, ex=ttl)))
+
+
+def redis_pipeline(*commands):
+    """Run several commands in one round trip (no MULTI). Each command is ("method", *args).
+
+    Returns the list of raw results, or None if Redis is unavailable.
+    """
+    def operation(r):
+        pipe = r.pipeline(transaction=False)
+        for name, *args in commands:
+            getattr(pipe, name)(*args)
+        return pipe.execute()
+    return _call(None, operation)
 
 
 def redis_delete(*keys):
     """Delete one or more keys from Redis. Fails silently."""
-    _ensure_init()
-    if not _redis_available or not keys:
-        return
-    try:
-        _redis_client.delete(*keys)
-    except Exception:
-        pass
+    if keys:
+        _call(None, lambda r: r.delete(*keys))
 
 
-def redis_delete_pattern(pattern):
-    """Delete all keys matching a pattern. Fails silently."""
-    _ensure_init()
-    if not _redis_available:
-        return
-    try:
-        cursor = 0
-        while True:
-            cursor, keys = _redis_client.scan(cursor=cursor, match=pattern, count=100)
-            if keys:
-                _redis_client.delete(*keys)
-            if cursor == 0:
-                break
-    except Exception:
-        pass
+def redis_incr(key):
+    """Atomically increment an integer key. Returns the new value, or None on failure."""
+    return _call(None, lambda r: r.incr(key))
+
+
+def redis_hgetall(key):
+    """All fields of a hash as {field: str}, or None if unavailable."""
+    fields = _call(None, lambda r: r.hgetall(key))
+    if fields is None:
+        return None
+    return {_text(k): _text(v) for k, v in fields.items()}
+
+
+def redis_hincrby_many(key, fields):
+    """Increment several hash fields by 1 in one round trip. Returns {field: new value} or None."""
+    def operation(r):
+        pipe = r.pipeline(transaction=True)
+        for field in fields:
+            pipe.hincrby(key, field, 1)
+        return dict(zip(fields, pipe.execute()))
+    return _call(None, operation)
+
+
+def redis_publish(channel, message):
+    """Publish a JSON message on a pub/sub channel. Fails silently."""
+    _call(None, lambda r: r.publish(channel, encode_value(message)))
+
+
+def redis_subscribe(channel):
+    """A PubSub subscribed to `channel` (on its own connection), or None if unavailable."""
+    def operation(r):
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        return pubsub
+    return _call(None, operation)
 
 
 def redis_is_available():
-    """Check if Redis is available."""
+    """Check if Redis is available (breaker closed)."""
     _ensure_init()
-    return _redis_available
+    return _state == CLOSED
+
+
+# --- sorted sets (leaderboard) ---
+
+def redis_zincrby(key, amount, member):
+    """Increment a sorted-set member's score. Returns the new score, or None on failure."""
+    return _call(None, lambda r: r.zincrby(key, amount, member))
+
+
+def redis_zreplace(key, mapping, ttl=None):
+    """Atomically replace a sorted set with {member: score}. Returns True on success."""
+    def operation(r):
+        pipe = r.pipeline(transaction=True)
+        pipe.delete(key)
+        if mapping:
+            pipe.zadd(key, mapping)
+            if ttl:
+                pipe.expire(key, ttl)
+        pipe.execute()
+        return True
+    return _call(False, operation)
+
+
+def redis_zrevrange(key, start, stop):
+    """[(member, score)] highest first, members as str. Returns None if unavailable."""
+    rows = _call(None, lambda r: r.zrevrange(key, start, stop, withscores=True))
+    if rows is None:
+        return None
+    return [(_text(member), score) for member, score in rows]
+
@@ -1,10 +1,15 @@
-"""Imam fuzzy search index — bigram scoring with process-local cache."""
+"""Imam fuzzy search index — bigram scoring over the catalog snapshot.
 
-from models import Imam, Mosque, db
-from utils import normalize_arabic
+Index entries are precompiled once per build: bigram sets, word prefix sets
+and a newline-joined word blob, so a query only does set lookups and
+substring tests per imam. `score_imam` is the original scorer, kept as the
+reference `score_entry` must agree with.
+"""
 
-_imam_index_cache = None
-_imam_index_count = None
+import heapq
+
+from services.catalog import get_catalog
+from utils import normalize_arabic_many
 
 
 def _strip_prefixes(text):
@@ -37,38 +42,52 @@ def _bigram_similarity(a, b):
     return 2.0 * len(bg_a & bg_b) / (len(bg_a) + len(bg_b))
 
 
+def _dice(bg_a, bg_b, threshold):
+    """Dice coefficient of two bigram sets, or 0.0 when it cannot reach `threshold`."""
+    total = len(bg_a) + len(bg_b)
+    if 2.0 * min(len(bg_a), len(bg_b)) / total < threshold:
+        return 0.0
+    return 2.0 * len(bg_a & bg_b) / total
+
+
+def _prefixes(words):
+    """Every prefix (including "") of every word — `w.startswith(x)` becomes `x in prefixes`."""
+    return {w[:i] for w in words for i in range(len(w) + 1)}
+
+
+def _compile_entry(imam, mosque, name_norm):
+    name_stripped = _strip_prefixes(name_norm)
+    words = name_norm.split()
+    stripped_words = name_stripped.split()
+    all_words = words + stripped_words
+    return {
+        'imam': imam,
+        'mosque': mosque,
+        'norm': name_norm,
+        'stripped': name_stripped,
+        'words': words,
+        'stripped_words': stripped_words,
+        # Precompiled for score_entry
+        'prefixes': _prefixes(all_words),
+        'stripped_prefixes': _prefixes(stripped_words),
+        'word_blob': "\n".join(all_words),
+        'stripped_bigrams': _bigrams(name_stripped) if name_stripped else None,
+        'word_bigrams': [_bigrams(w) for w in stripped_words],
+    }
+
+
+def _build_imam_index(catalog):
+    imams = list(catalog.imams.values())
+    names = normalize_arabic_many(imam.name for imam in imams)
+    return [
+        _compile_entry(imam, catalog.mosques.get(imam.mosque_id), name_norm)
+        for imam, name_norm in zip(imams, names)
+    ]
+
+
 def get_imam_index():
-    """Build and cache normalized imam data for search. Invalidated if imam count changes."""
-    global _imam_index_cache, _imam_index_count
-    current_count = db.session.query(db.func.count(Imam.id)).scalar()
-    if _imam_index_cache is not None and _imam_index_count == current_count:
-        return _imam_index_cache
-
-    pairs = db.session.query(Imam, Mosque).outerjoin(Mosque, Imam.mosque_id == Mosque.id).all()
-    index = []
-    for imam, mosque in pairs:
-        name_norm = normalize_arabic(imam.name)
-        name_stripped = _strip_prefixes(name_norm)
-        words = name_norm.split()
-        stripped_words = name_stripped.split()
-        index.append({
-            'imam': imam,
-            'mosque': mosque,
-            'norm': name_norm,
-            'stripped': name_stripped,
-            'words': words,
-            'stripped_words': stripped_words,
-        })
-    _imam_index_cache = index
-    _imam_index_count = current_count
-    return index
-
-
-def invalidate_imam_index():
-    """Clear the imam search index cache."""
-    global _imam_index_cache, _imam_index_count
-    _imam_index_cache = None
-    _imam_index_count = None
+    """Normalized, precompiled imam data for search, built from (and dropped with) the catalog snapshot."""
+    return get_catalog().derived("imam_index", _build_imam_index)
 
 
 def score_imam(q_norm, q_stripped, q_words, q_stripped_words, entry):
@@ -123,3 +142,87 @@ def score_imam(q_norm, q_stripped, q_words, q_stripped_words, entry):
             return int(30 + wsim * 20)
 
     return 0
+
+
+def compile_query(q_norm):
+    """Everything score_entry needs from a normalized query, computed once per search."""
+    q_stripped = _strip_prefixes(q_norm)
+    q_words = q_norm.split()
+    q_stripped_words = q_stripped.split()
+    terms = q_words + q_stripped_words
+    return {
+        'norm': q_norm,
+        'stripped': q_stripped,
+        'words': q_words,
+        'stripped_words': q_stripped_words,
+        'terms': terms,
+        'unique_terms': len(set(terms)),
+        'bigrams': _bigrams(q_stripped) if q_stripped else None,
+    }
+
+
+def score_entry(query, entry):
+    """score_imam over a compiled query and a precompiled index entry. Same scores, no rebuilding."""
+    q_norm = query['norm']
+    q_stripped = query['stripped']
+    name = entry['norm']
+    stripped = entry['stripped']
+
+    if q_norm == name:
+        return 100
+    if name.startswith(q_norm):
+        return 95
+    if stripped.startswith(q_stripped):
+        return 90
+    if q_norm in name:
+        return 80
+    if q_stripped in stripped:
+        return 75
+
+    n_words = len(query['words'])
+    if n_words == 1:
+        prefixes = entry['prefixes']
+        if q_norm in prefixes or q_stripped in prefixes:
+            return 70
+        q_stripped_words = query['stripped_words']
+        if q_stripped_words and q_stripped_words[0] in entry['stripped_prefixes']:
+            return 65
+    elif n_words > 1:
+        # Query terms have no whitespace, so a hit in the blob is a hit inside one word
+        blob = entry['word_blob']
+        matched = sum(1 for qw in query['terms'] if qw in blob)
+        ratio = matched / query['unique_terms']
+        if ratio >= 0.8:
+            return 75
+        if ratio >= 0.5:
+            return 55
+
+    q_bigrams = query['bigrams']
+    if q_bigrams is None:
+        return 0
+    if entry['stripped_bigrams'] is not None:
+        sim = _dice(q_bigrams, entry['stripped_bigrams'], 0.6)
+        if sim >= 0.6:
+            return int(40 + sim * 20)
+
+    for w_bigrams in entry['word_bigrams']:
+        wsim = _dice(q_bigrams, w_bigrams, 0.5)
+        if wsim >= 0.5:
+            return int(30 + wsim * 20)
+
+    return 0
+
+
+def rank_imams(index, query, limit=15):
+    """Top `limit` index entries for a compiled query, best first (ties keep index order)."""
+    scored = []
+    perfect = 0
+    for entry in index:
+        s = score_entry(query, entry)
+        if s > 0:
+            scored.append((s, entry))
+            if s == 100:
+                perfect += 1
+                if perfect >= limit:  # nothing later can outrank or tie ahead of these
+                    break
+    return [entry for _, entry in heapq.nsmallest(limit, scored, key=lambda x: -x[0])]
@@ -1,11 +1,49 @@
 """JSON serialization helpers for API responses."""
 
-from models import Imam
+import base64
+import binascii
+import bisect
+import json
 
+from services.catalog import get_catalog
 
-def serialize_mosque(mosque, imam=None, distance=None):
-    if imam is None:
-        imam = Imam.query.filter_by(mosque_id=mosque.id).first()
+# Default for serialize_mosque's `imam`: "not loaded yet", as opposed to None = "no imam"
+IMAM_NOT_LOADED = object()
+
+# Every key serialize_mosque can emit, in response order
+MOSQUE_FIELDS = (
+    "id", "name", "location", "area", "map_link", "latitude", "longitude",
+    "imam", "audio_sample", "youtube_link",
+)
+
+_FIELD_GETTERS = {
+    "id": lambda m, i: m.id,
+    "name": lambda m, i: m.name,
+    "location": lambda m, i: m.location,
+    "area": lambda m, i: m.area,
+    "map_link": lambda m, i: m.map_link,
+    "latitude": lambda m, i: m.latitude,
+    "longitude": lambda m, i: m.longitude,
+    "imam": lambda m, i: i.name if i else None,
+    "audio_sample": lambda m, i: i.audio_sample if i else None,
+    "youtube_link": lambda m, i: i.youtube_link if i else None,
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH_IDS = 200
+
+
+def serialize_mosque(mosque, imam=IMAM_NOT_LOADED, distance=None, fields=None):
+    """Serialize a mosque (ORM row or catalog record) with its imam.
+
+    Pass `imam=None` for a mosque known to have no imam. When the imam was not
+    loaded at all it is resolved from the catalog snapshot — never by a lazy query.
+    """
+    if imam is IMAM_NOT_LOADED:
+        imam = get_catalog().imam_by_mosque.get(mosque.id)
+    if fields is not None:
+        return {f: _FIELD_GETTERS[f](mosque, imam) for f in fields}
     result = {
         "id": mosque.id,
         "name": mosque.name,
@@ -21,3 +59,103 @@ def serialize_mosque(mosque, imam=None, distance=None):
     if distance is not None:
         result["distance"] = distance
     return result
+
+
+def parse_fields(raw):
+    """Parse a `fields=` projection into a canonical tuple, or None for all fields.
+
+    Raises ValueError on unknown field names.
+    """
+    if not raw:
+        return None
+    requested = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = requested - set(MOSQUE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in MOSQUE_FIELDS if f in requested) or None
+
+
+def _listing_key(row):
+    mosque = row[0]
+    return mosque.name, mosque.id
+
+
+def encode_cursor(name, mosque_id):
+    """Opaque keyset cursor: the (name, id) of the last mosque on a page."""
+    raw = json.dumps(["k", name, mosque_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(name, id) encoded in an opaque cursor. Raises ValueError if it was tampered with."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if (
+        not isinstance(raw, list) or len(raw) != 3 or raw[0] != "k"
+        or not isinstance(raw[1], str) or not isinstance(raw[2], int)
+    ):
+        raise ValueError("Invalid cursor")
+    return raw[1], raw[2]
+
+
+def parse_page(args):
+    """(after, page_size) from `cursor`/`page_size` query args, or None when not paginating.
+
+    `after` is the (name, id) the page starts after, or None for the first page.
+    Raises ValueError on bad input.
+    """
+    cursor = args.get("cursor", "")
+    page_size = args.get("page_size", "")
+    if not cursor and not page_size:
+        return None
+    if page_size:
+        if not page_size.isdigit() or int(page_size) < 1:
+            raise ValueError("page_size must be a positive integer")
+        size = min(MAX_PAGE_SIZE, int(page_size))
+    else:
+        size = DEFAULT_PAGE_SIZE
+    return (decode_cursor(cursor) if cursor else None), size
+
+
+def serialize_listing(pairs, fields=None, page=None):
+    """Serialize (mosque, imam) rows as a plain list, or as a cursor page when `page` is set.
+
+    `pairs` must be in catalog order, (name, id). A page resumes after the
+    cursor's mosque even if it was since deleted, and never splits one
+    mosque's rows (one per imam) across two pages.
+    """
+    if page is None:
+        return [serialize_mosque(m, imam=i, fields=fields) for m, i in pairs]
+    after, size = page
+    start = bisect.bisect_right(pairs, after, key=_listing_key) if after else 0
+    end = min(start + size, len(pairs))
+    while 0 < end < len(pairs) and pairs[end][0].id == pairs[end - 1][0].id:
+        end += 1
+    window = pairs[start:end]
+    return {
+        "items": [serialize_mosque(m, imam=i, fields=fields) for m, i in window],
+        "next_cursor": encode_cursor(*_listing_key(window[-1])) if end < len(pairs) else None,
+    }
+
+
+def parse_ids(raw):
+    """Parse `ids=1,2,3` into a de-duplicated list of ints (request order kept). Raises ValueError."""
+    ids = []
+    seen = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit():
+            raise ValueError("ids must be a comma-separated list of integers")
+        mosque_id = int(part)
+        if mosque_id not in seen:
+            seen.add(mosque_id)
+            ids.append(mosque_id)
+    if not ids:
+        raise ValueError("ids is required")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} ids per request")
+    return ids
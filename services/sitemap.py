@@ -0,0 +1,87 @@
+"""sitemap.xml — streamed from the catalog snapshot, split into an index + shards when large.
+
+Crawlers get a single <urlset> while the site fits in one shard. Past
+SHARD_SIZE URLs, /sitemap.xml becomes a <sitemapindex> pointing at
+/sitemap-1.xml, /sitemap-2.xml, ... Mosque URLs carry a <lastmod> taken from
+the later of the mosque's and its imam's `updated_at`.
+"""
+
+from xml.sax.saxutils import escape
+
+SITE_URL = "https://taraweeh.org"
+SHARD_SIZE = 5000  # well under the protocol's 50,000 URLs / 50 MB per file
+
+STATIC_PATHS = (
+    "/", "/about", "/contact", "/map", "/favorites",
+    "/tracker", "/leaderboard", "/makkah", "/request",
+)
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _lastmod(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps).strftime("%Y-%m-%d") if stamps else None
+
+
+def _lastmod_of(urls):
+    stamps = [lastmod for _, lastmod in urls if lastmod]
+    return max(stamps) if stamps else None
+
+
+def sitemap_urls(catalog):
+    """[(url, lastmod)] for every public page, static pages first, mosques by id."""
+    urls = [(SITE_URL + path, None) for path in STATIC_PATHS]
+    for mosque_id in sorted(catalog.mosques):
+        mosque = catalog.mosques[mosque_id]
+        imam = catalog.imam_by_mosque.get(mosque_id)
+        urls.append((
+            f"{SITE_URL}/mosque/{mosque_id}",
+            _lastmod(mosque.updated_at, imam.updated_at if imam else None),
+        ))
+    return urls
+
+
+def shard_count(urls):
+    """Number of shard files, or 0 when everything fits in a single <urlset>."""
+    if len(urls) <= SHARD_SIZE:
+        return 0
+    return -(-len(urls) // SHARD_SIZE)
+
+
+def _entry(tag, url, lastmod):
+    if lastmod:
+        return f"  <{tag}><loc>{escape(url)}</loc><lastmod>{lastmod}</lastmod></{tag}>\n"
+    return f"  <{tag}><loc>{escape(url)}</loc></{tag}>\n"
+
+
+def iter_urlset(urls):
+    """Yield a <urlset> document chunk by chunk."""
+    yield _XML_HEADER
+    yield f'<urlset xmlns="{_NAMESPACE}">\n'
+    for url, lastmod in urls:
+        yield _entry("url", url, lastmod)
+    yield "</urlset>\n"
+
+
+def iter_sitemap_index(urls):
+    """Yield a <sitemapindex> document listing one shard per SHARD_SIZE URLs."""
+    yield _XML_HEADER
+    yield f'<sitemapindex xmlns="{_NAMESPACE}">\n'
+    for n in range(shard_count(urls)):
+        shard = urls[n * SHARD_SIZE:(n + 1) * SHARD_SIZE]
+        yield _entry("sitemap", f"{SITE_URL}/sitemap-{n + 1}.xml", _lastmod_of(shard))
+    yield "</sitemapindex>\n"
+
+
+def shard_urls(urls, shard):
+    """URLs in 1-based shard `shard`, or None if there is no such shard."""
+    if not 1 <= shard <= shard_count(urls):
+        return None
+    return urls[(shard - 1) * SHARD_SIZE:shard * SHARD_SIZE]
+
+
+def render(chunks):
+    """Join a streamed document into the bytes that get cached and precompressed."""
+    return "".join(chunks).encode("utf-8")
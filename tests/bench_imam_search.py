@@ -0,0 +1,79 @@
+"""
+Benchmark: precompiled imam scoring (rank_imams) vs the reference scorer (score_imam).
+
+Usage:
+    python tests/bench_imam_search.py [n_imams] [n_queries]
+
+Builds a synthetic index of Arabic imam names, checks that both engines return
+identical top-15 rankings for every query, then times them.
+"""
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.search import _compile_entry, compile_query, rank_imams, score_imam  # noqa: E402
+from utils import normalize_arabic, normalize_arabic_many  # noqa: E402
+
+TITLES = ["", "الشيخ ", "شيخ ", "الامام ", "الإمام "]
+FIRST = ["عبدالرحمن", "خالد", "ماهر", "ياسر", "سعود", "عبدالله", "محمد", "ناصر", "فهد", "إبراهيم"]
+FAMILY = ["السديس", "الجليل", "المعيقلي", "الدوسري", "الشريم", "القطامي", "العفاسي", "الغامدي",
+          "البليهي", "الجهني", "الحذيفي", "المطيري", "القحطاني", "العتيبي", "الشهري"]
+QUERIES = ["خالد", "الجليل", "الشيخ ماهر", "سديس", "عبدالرحمن السديس", "الدوسري ياسر",
+           "مطيري", "القحطاني فهد", "جهني", "الامام الشريم", "عفاسي", "غامدي سعود", "ابراهيم"]
+
+
+def build_index(n_imams, rng):
+    imams = []
+    for i in range(n_imams):
+        name = f"{rng.choice(TITLES)}{rng.choice(FIRST)} {rng.choice(FIRST)} {rng.choice(FAMILY)}"
+        imams.append(SimpleNamespace(id=i + 1, name=name, mosque_id=None))
+    names = normalize_arabic_many(imam.name for imam in imams)
+    return [_compile_entry(imam, None, name) for imam, name in zip(imams, names)]
+
+
+def reference_top(index, q_norm, limit=15):
+    query = compile_query(q_norm)
+    args = (q_norm, query['stripped'], query['words'], query['stripped_words'])
+    scored = []
+    for entry in index:
+        s = score_imam(*args, entry)
+        if s > 0:
+            scored.append((s, entry))
+    scored.sort(key=lambda x: -x[0])
+    return [e for _, e in scored[:limit]]
+
+
+def main():
+    n_imams = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+    index = build_index(n_imams, rng)
+    queries = [normalize_arabic(rng.choice(QUERIES)) for _ in range(n_queries)]
+
+    for q in set(queries):
+        expected = [e['imam'].id for e in reference_top(index, q)]
+        got = [e['imam'].id for e in rank_imams(index, compile_query(q))]
+        assert got == expected, f"ranking mismatch for {q!r}"
+    print(f"identical top-15 rankings for {len(set(queries))} distinct queries over {n_imams} imams")
+
+    start = time.perf_counter()
+    for q in queries:
+        reference_top(index, q)
+    reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for q in queries:
+        rank_imams(index, compile_query(q))
+    compiled = time.perf_counter() - start
+
+    print(f"score_imam + sort : {reference / n_queries * 1000:.2f} ms/query")
+    print(f"rank_imams        : {compiled / n_queries * 1000:.2f} ms/query ({reference / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
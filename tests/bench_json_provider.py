@@ -0,0 +1,80 @@
+"""
+Benchmark: FastJSONProvider vs Flask's default provider on a mosque listing.
+
+Usage:
+    python tests/bench_json_provider.py [n_mosques] [rounds]
+
+Builds a synthetic /api/mosques payload (Arabic names, coordinates, imam
+fields), checks the fast provider emits the same bytes as the stdlib encoder
+with ensure_ascii=False, then times `app.json.response(...)` for each.
+"""
+
+import os
+import random
+import sys
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.json_provider import FastJSONProvider, orjson  # noqa: E402
+
+NAMES = ["جامع الراجحي", "مسجد الملك خالد", "جامع الإمام تركي بن عبدالله", "مسجد النور", "جامع الأميرة موضي"]
+AREAS = ["شمال", "جنوب", "شرق", "غرب", "وسط"]
+LOCATIONS = ["الملقا", "حطين", "الشفا", "الروضة", "النرجس", "العليا", "السويدي"]
+IMAMS = ["الشيخ خالد الجليل", "الشيخ ياسر الدوسري", "الشيخ ماهر المعيقلي", None]
+
+
+def build_payload(n, rng):
+    mosques = []
+    for i in range(n):
+        imam = rng.choice(IMAMS)
+        mosques.append({
+            "id": i + 1,
+            "name": f"{rng.choice(NAMES)} {i}",
+            "location": rng.choice(LOCATIONS),
+            "area": rng.choice(AREAS),
+            "map_link": f"https://maps.google.com/?q={i}",
+            "latitude": round(24.5 + rng.random(), 6),
+            "longitude": round(46.5 + rng.random(), 6),
+            "imam": imam,
+            "audio_sample": f"https://cdn.example.com/audio/{i}.mp3" if imam else None,
+            "youtube_link": None,
+        })
+    return mosques
+
+
+def time_provider(app, provider, payload, rounds):
+    app.json = provider
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            body = provider.response(payload).get_data()
+        return (time.perf_counter() - start) / rounds, len(body)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payload = build_payload(n, random.Random(42))
+    app = Flask(__name__)
+
+    default = DefaultJSONProvider(app)
+    utf8 = DefaultJSONProvider(app)
+    utf8.ensure_ascii = False
+    fast = FastJSONProvider(app)
+
+    with app.app_context():
+        assert fast.response(payload).get_data() == utf8.response(payload).get_data(), "output differs"
+    print(f"identical bytes to the stdlib encoder for {n} mosques (orjson: {orjson is not None})")
+
+    base, base_size = time_provider(app, default, payload, rounds)
+    for label, provider in (("default (ascii)", default), ("stdlib utf-8", utf8), ("FastJSONProvider", fast)):
+        seconds, size = time_provider(app, provider, payload, rounds)
+        print(f"{label:<17}: {seconds * 1000:7.2f} ms/response  {size / 1024:7.1f} KiB  ({base / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
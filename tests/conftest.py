@@ -7,6 +7,9 @@ import pytest
 
 from app import app as flask_app
 from models import db, Mosque, Imam, PublicUser
+from services.cache import flush_invalidations, invalidate_caches
+from services.cache_tags import committed_tags
+from services.leaderboard import reset_leaderboard
 
 
 @pytest.fixture()
@@ -21,6 +24,10 @@ def app():
         db.drop_all()
         db.create_all()
         _seed_data()
+        committed_tags()  # the full invalidation below covers the seed
+        flush_invalidations()
+        invalidate_caches()
+        reset_leaderboard()
         yield flask_app
         db.session.remove()
         db.drop_all()
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+from firebase_admin.auth import RevokedIdTokenError
+
+import auth_utils
+
+HEADERS = {"Authorization": "Bearer token-a"}
+
+
+@pytest.fixture()
+def firebase(monkeypatch):
+    calls = []
+    state = {"revoked": False, "exp": time.time() + 3600}
+
+    def verify_id_token(token, check_revoked=False):
+        calls.append(token)
+        if state["revoked"]:
+            raise RevokedIdTokenError("revoked")
+        return {"uid": "uid_a", "exp": state["exp"]}
+
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", verify_id_token)
+    auth_utils._local_tokens.clear()
+    yield calls, state
+    auth_utils._local_tokens.clear()
+
+
+def test_verified_tokens_are_reused_across_requests(client, firebase):
+    calls, _ = firebase
+    for _ in range(3):
+        assert client.get("/api/user/favorites", headers=HEADERS).status_code == 200
+    assert calls == ["token-a"]
+
+
+def test_revocation_is_rechecked_after_the_interval(app, client, firebase):
+    calls, state = firebase
+    app.config["FIREBASE_REVOCATION_CHECK_INTERVAL"] = 0
+    try:
+        assert client.get("/api/user/favorites", headers=HEADERS).status_code == 200
+        state["revoked"] = True
+        resp = client.get("/api/user/favorites", headers=HEADERS)
+        assert resp.status_code == 401
+        assert len(calls) == 2
+    finally:
+        app.config["FIREBASE_REVOCATION_CHECK_INTERVAL"] = 300
+
+
+def test_tokens_near_expiry_are_not_cached(client, firebase):
+    calls, state = firebase
+    state["exp"] = time.time() + auth_utils.TOKEN_EXPIRY_MARGIN - 1
+    client.get("/api/user/favorites", headers=HEADERS)
+    client.get("/api/user/favorites", headers=HEADERS)
+    assert len(calls) == 2
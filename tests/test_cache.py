@@ -0,0 +1,246 @@
+import threading
+import time
+
+from services import cache
+from services.cache import CachedPayload, cache_fetch_payload, cache_get, cache_stats
+from services.lru import LRUCache
+
+
+def test_concurrent_misses_share_one_rebuild(app):
+    calls = []
+    gate = threading.Event()
+
+    def build():
+        calls.append(1)
+        gate.wait(2)
+        return CachedPayload(b'["slow"]')
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache_fetch_payload("slow-key", build)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert len({id(p) for p in results}) == 1
+    stats = cache_stats()
+    assert stats["rebuilds"] >= 1 and stats["waiters"] >= 7
+    assert cache_get("slow-key").body == b'["slow"]'
+
+
+def test_l1_entries_expire_and_are_bounded(monkeypatch):
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1, ttl=60)
+    lru.set("b", 2, ttl=0)
+    assert lru.get("a") == 1
+    assert lru.get("b") is None and lru.peek("b")[0] == 2
+    lru.set("c", 3)
+    assert len(lru) == 2 and "b" not in lru
+
+    cache.cache_set_payload("short", CachedPayload(b"[1]", built_at=time.time() - cache.CACHE_TTL))
+    assert cache.cache_get("short") is None  # expired in L1 and there is no Redis
+
+
+def test_stale_payload_is_served_while_refreshing_in_background(app):
+    stale = CachedPayload(b'["old"]', built_at=time.time() - cache.SOFT_TTL - 1)
+    cache.cache_set_payload("hot", stale)
+    refreshed = threading.Event()
+
+    def build():
+        refreshed.set()
+        return CachedPayload(b'["new"]')
+
+    assert cache_fetch_payload("hot", build) is stale
+    assert refreshed.wait(2)
+    for _ in range(100):
+        if cache_get("hot").body == b'["new"]':
+            break
+        time.sleep(0.01)
+    assert cache_get("hot").body == b'["new"]'
+    assert cache_stats()["stale_served"] >= 1
+
+
+def test_invalidation_moves_to_a_new_namespace(app):
+    cache.cache_set_payload("ns-key", CachedPayload(b"[1]"))
+    before = cache._namespaced("ns-key")
+    assert cache_get("ns-key") is not None
+
+    cache.invalidate_caches()
+    assert cache._namespaced("ns-key") != before
+    assert cache_get("ns-key") is None
+
+
+def test_writes_only_invalidate_the_tags_they_touch(app, client):
+    from models import db, Mosque, PublicUser
+    from services.cache_tags import committed_tags
+
+    db.session.add(Mosque(id=2, name="جامع الجنوب", location="الشفا", area="جنوب"))
+    db.session.commit()
+    cache.invalidate_caches(*committed_tags(db.session))
+    for url in ("/api/mosques", "/api/locations?area=شمال", "/api/locations?area=جنوب"):
+        client.get(url)
+
+    Mosque.query.get(1).location = "حطين"
+    db.session.commit()
+    assert committed_tags(db.session) >= {"mosques", "mosque:1", "area:شمال"}
+    cache.invalidate_caches("mosques", "mosque:1", "area:شمال")
+
+    assert cache_get("mosques") is None
+    assert cache_get("locations:شمال") is None
+    assert cache_get("locations:جنوب") is not None
+    assert client.get("/api/locations?area=شمال").json == ["حطين"]
+
+    # A user-only write leaves every catalog entry warm
+    cache.flush_invalidations()  # the commits above queued their own invalidations too
+    client.get("/api/mosques")
+    PublicUser.query.get(1).display_name = "Renamed"
+    db.session.commit()
+    cache.invalidate_written()
+    # display_name is shown on the leaderboard
+    assert cache.flush_invalidations() == {"user:1", "uid:uid_a", "username:tester_a", "leaderboard"}
+    assert cache_get("mosques") is not None
+
+
+def test_bulk_writes_coalesce_into_one_flush(app, monkeypatch):
+    from models import db, Mosque
+    from services.cache_tags import tag_versions
+
+    monkeypatch.setattr(cache, "INVALIDATION_DEBOUNCE", 0.2)
+    flushes = []
+    monkeypatch.setattr(cache, "publish_invalidation", lambda generation, tags: flushes.append(set(tags)))
+
+    for i in range(2, 12):
+        db.session.add(Mosque(id=i, name=f"جامع {i}", location="الملقا", area="شمال"))
+        db.session.commit()
+        cache.invalidate_written()
+    assert flushes == []
+    # The shared versions moved at write time: a worker exiting now loses nothing
+    assert tag_versions(["mosque:11"])["mosque:11"] > 0
+
+    for _ in range(100):
+        if flushes:
+            break
+        time.sleep(0.02)
+    assert len(flushes) == 1
+    assert {"mosques", "mosque:2", "mosque:11"} <= flushes[0]
+
+
+def _write_as(app, uid, model):
+    """Commit `model` in a request authenticated as `uid`; the response's Set-Cookie header."""
+    from flask import g
+    from models import db
+
+    # A fresh app context: the writer's request must not share pytest-flask's `g`
+    with app.app_context(), app.test_request_context():
+        g.firebase_decoded = {"uid": uid}
+        db.session.add(model)
+        db.session.commit()
+        cache.invalidate_written()
+        response = app.process_response(app.response_class())
+    return response.headers.get("Set-Cookie")
+
+
+def _signed_in_as(monkeypatch, uid):
+    import auth_utils
+
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", lambda t, check_revoked=False: {"uid": uid})
+    return {"Authorization": "Bearer token"}
+
+
+def test_writer_reads_its_own_write_before_the_flush(app, client, monkeypatch):
+    from models import Mosque
+    from services.invalidation import RW_COOKIE
+
+    assert client.get("/api/mosques").status_code == 200  # warm the shared cache
+
+    cookie = _write_as(app, "uid_w", Mosque(id=2, name="جامع الجنوب", location="الشفا", area="جنوب"))
+    assert cookie.startswith(f"{RW_COOKIE}=")
+    client.set_cookie(RW_COOKIE, cookie.split(";")[0].split("=", 1)[1])
+
+    # Everyone else still gets the cached list until the flush; the writer does not
+    headers = _signed_in_as(monkeypatch, "uid_other")
+    assert len(client.get("/api/mosques", headers=headers).json) == 1
+    headers = _signed_in_as(monkeypatch, "uid_w")
+    assert len(client.get("/api/mosques", headers=headers).json) == 2
+
+    cache.flush_invalidations()
+    client.delete_cookie(RW_COOKIE)
+    assert len(client.get("/api/mosques").json) == 2
+
+
+def test_forged_read_your_writes_cookie_is_ignored(app, client, monkeypatch):
+    from models import Mosque
+    from services.invalidation import RW_COOKIE
+
+    assert client.get("/api/mosques").status_code == 200
+    _write_as(app, "uid_w", Mosque(id=2, name="جامع الجنوب", location="الشفا", area="جنوب"))
+
+    headers = _signed_in_as(monkeypatch, "uid_w")
+    client.set_cookie(RW_COOKIE, "99999999999")
+    assert len(client.get("/api/mosques", headers=headers).json) == 1
+
+
+def test_user_only_write_keeps_the_shared_catalog(app, client, monkeypatch):
+    from models import UserFavorite
+    from services.invalidation import RW_COOKIE
+
+    assert client.get("/api/mosques").status_code == 200
+    cookie = _write_as(app, "uid_a", UserFavorite(user_id=1, mosque_id=1))
+    client.set_cookie(RW_COOKIE, cookie.split(";")[0].split("=", 1)[1])
+
+    before = cache_stats()["bypassed"]
+    headers = _signed_in_as(monkeypatch, "uid_a")
+    assert client.get("/api/mosques", headers=headers).status_code == 200
+    assert cache_stats()["bypassed"] == before
+
+
+def test_l2_value_keeps_the_body_as_raw_bytes():
+    body = '["جامع\\nالراجحي", "\\u0000"]'.encode("utf-8") + b"\n\xff"
+    payload = CachedPayload(body, tags={"mosques": 3})
+    header, raw = cache._unpack(cache._pack(payload))
+    assert raw == body
+    assert header["etag"] == payload.etag
+    assert header["tags"] == {"mosques": 3}
+    assert cache._unpack(b'{"body": "legacy entry"}') == (None, None)
+
+
+def test_variants_are_compressed_on_first_negotiation(app):
+    import gzip
+
+    payload = CachedPayload(b"[" + b'"\xd8\xac\xd8\xa7\xd9\x85\xd8\xb9",' * 100 + b"0]")
+    assert payload.variants == {}
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = cache.cached_response(payload)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert list(payload.variants) == ["gzip"]
+    assert gzip.decompress(response.get_data()) == payload.body
+
+    one_off = CachedPayload(payload.body, precompress=False)
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = cache.cached_response(one_off)
+    assert "Content-Encoding" not in response.headers  # Flask-Compress handles it after the view
+    assert one_off.variants == {}
+
+
+def test_build_from_a_lagging_snapshot_is_not_stored(app, client):
+    from models import db, Mosque
+    from services.cache_tags import bump_tags
+
+    assert len(client.get("/api/mosques").json) == 1
+    # Another worker's write: its tag bump is visible here before the generation check catches up
+    db.session.add(Mosque(id=2, name="جامع الجنوب", location="الشفا", area="جنوب"))
+    db.session.commit()
+    bump_tags(["mosques"])
+
+    before = cache_stats()["stale_builds"]
+    client.get("/api/mosques")
+    assert cache_stats()["stale_builds"] == before + 1
+    assert cache_get("mosques") is None
+    assert len(client.get("/api/mosques").json) == 2
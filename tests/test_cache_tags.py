@@ -0,0 +1,112 @@
+import pytest
+
+from services import cache_tags, redis_client
+
+
+class FakeRedis:
+    """Just enough of redis-py for tag versions: strings with TTLs and one hash."""
+
+    def __init__(self):
+        self.strings = {}
+        self.ttls = {}
+        self.hashes = {}
+
+    def hgetall(self, key):
+        return {k.encode(): str(v).encode() for k, v in self.hashes.get(key, {}).items()}
+
+    def mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def set(self, key, value, ex=None):
+        self.redis.strings[key] = str(value).encode()
+        self.redis.ttls[key] = ex
+        self.results.append(True)
+
+    def hset(self, key, field, value):
+        self.redis.hashes.setdefault(key, {})[field] = value
+        self.results.append(1)
+
+    def hincrby(self, key, field, amount):
+        fields = self.redis.hashes.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+        self.results.append(fields[field])
+
+    def execute(self):
+        return self.results
+
+
+@pytest.fixture()
+def fake_redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(redis_client, "_redis_client", fake)
+    monkeypatch.setattr(redis_client, "_init_attempted", True)
+    redis_client._close_breaker()
+    monkeypatch.setattr(cache_tags, "_versions", {})
+    monkeypatch.setattr(cache_tags, "_checked_at", None)
+    monkeypatch.setattr(cache_tags, "_user_versions", cache_tags.LRUCache())
+    yield fake
+    with redis_client._breaker_lock:
+        redis_client._state = redis_client.DISABLED
+
+
+def test_user_tags_get_their_own_expiring_keys(fake_redis):
+    bumped = cache_tags.bump_tags(["mosques", "user:7", "uid:abc"])
+
+    assert set(fake_redis.hashes[cache_tags.TAGS_KEY]) == {"mosques"}
+    key = cache_tags.USER_TAG_KEY_PREFIX + "user:7"
+    assert fake_redis.ttls[key] == cache_tags.USER_TAG_TTL
+    assert cache_tags.tag_versions(["user:7", "user:8", "mosques"]) == {
+        "user:7": bumped["user:7"], "user:8": 0, "mosques": 1,
+    }
+
+
+def test_another_workers_user_bump_is_read_from_redis(fake_redis, monkeypatch):
+    recorded = cache_tags.snapshot(["user:7"])
+    fake_redis.strings[cache_tags.USER_TAG_KEY_PREFIX + "user:7"] = b"123"
+    assert cache_tags.is_current(recorded)  # this worker's copy is trusted for TAG_CHECK_INTERVAL
+
+    monkeypatch.setattr(cache_tags, "_user_versions", cache_tags.LRUCache())
+    assert not cache_tags.is_current(recorded)
+    assert cache_tags.tag_versions(["user:7"]) == {"user:7": 123}
+
+
+def test_shared_versions_never_move_backwards(fake_redis, monkeypatch):
+    cache_tags.bump_tags(["mosques"])
+    recorded = cache_tags.snapshot(["mosques"])
+
+    # Redis unreachable: the bump stays local
+    hincrby_many = cache_tags.redis_hincrby_many
+    monkeypatch.setattr(cache_tags, "redis_hincrby_many", lambda key, fields: None)
+    cache_tags.bump_tags(["mosques"])
+    monkeypatch.setattr(cache_tags, "redis_hincrby_many", hincrby_many)
+    assert not cache_tags.is_current(recorded)
+
+    # Back: the older Redis value does not revive pre-write entries, and is raised to ours
+    monkeypatch.setattr(cache_tags, "_checked_at", None)
+    assert not cache_tags.is_current(recorded)
+    assert fake_redis.hashes[cache_tags.TAGS_KEY]["mosques"] == 2
+
+    # Flushed hash: a new bump continues above what this worker has seen
+    fake_redis.hashes.clear()
+    assert cache_tags.bump_tags(["mosques"]) == {"mosques": 3}
+
+
+def test_unobserved_bump_reaches_redis_first(fake_redis):
+    recorded = cache_tags.snapshot(["mosques", "user:7"])
+    bumped = cache_tags.bump_tags(["mosques", "user:7"], observe=False)
+
+    assert fake_redis.hashes[cache_tags.TAGS_KEY]["mosques"] == 1
+    assert cache_tags.USER_TAG_KEY_PREFIX + "user:7" in fake_redis.strings
+    assert cache_tags.is_current(recorded)  # this worker adopts it when the flush runs
+
+    cache_tags.observe_tags(bumped)
+    assert not cache_tags.is_current(recorded)
@@ -0,0 +1,210 @@
+import json
+
+from models import db, Imam, Mosque
+from services.cache import invalidate_caches
+from services.catalog import get_catalog
+
+
+def test_catalog_rows_mirror_mosque_imam_join(app):
+    with app.app_context():
+        db.session.add(Mosque(id=2, name="جامع بلا إمام", location="حطين", area="شمال"))
+        db.session.add(Imam(id=2, name="إمام غير معين", mosque_id=None))
+        db.session.commit()
+        invalidate_caches()
+
+        catalog = get_catalog()
+        assert [(m.id, i.id if i else None) for m, i in catalog.rows] == [(1, 1), (2, None)]
+        assert catalog.mosque_row(1)[1].name == "الشيخ خالد الجليل"
+        assert catalog.mosque_row(99) is None
+        assert 2 in catalog.imams
+        assert catalog.filter_rows(area="شمال", location="الملقا")[0][0].id == 1
+
+
+def test_catalog_is_replaced_on_invalidation(app, client):
+    with app.app_context():
+        before = get_catalog()
+        Mosque.query.get(1).name = "جامع معدل"
+        db.session.commit()
+        assert get_catalog() is before
+        invalidate_caches()
+        assert get_catalog() is not before
+
+    data = json.loads(client.get("/api/mosques/1").data)
+    assert data["name"] == "جامع معدل"
+    assert data["imam"] == "الشيخ خالد الجليل"
+
+
+def test_mosques_projection_and_cursor_pages(app, client):
+    with app.app_context():
+        for n in range(2, 7):
+            db.session.add(Mosque(id=n, name=f"مسجد {n}", location="حطين", area="شمال"))
+        db.session.commit()
+        invalidate_caches()
+
+    full = json.loads(client.get("/api/mosques").data)
+    projected = json.loads(client.get("/api/mosques?fields=name,id").data)
+    assert projected == [{"id": m["id"], "name": m["name"]} for m in full]
+
+    seen, cursor = [], None
+    while True:
+        url = "/api/mosques?page_size=2&fields=id" + (f"&cursor={cursor}" if cursor else "")
+        page = json.loads(client.get(url).data)
+        seen.extend(m["id"] for m in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [m["id"] for m in full]
+
+    assert client.get("/api/mosques?fields=password").status_code == 400
+    assert client.get("/api/mosques?cursor=bogus").status_code == 400
+    page = json.loads(client.get("/api/mosques/search?q=مسجد&page_size=3&fields=id").data)
+    assert len(page["items"]) == 3 and page["next_cursor"]
+
+
+def test_cursor_resumes_after_the_last_mosque_when_rows_are_added(app, client):
+    with app.app_context():
+        for n in range(2, 7):
+            db.session.add(Mosque(id=n, name=f"مسجد {n}", location="حطين", area="شمال"))
+        db.session.commit()
+        invalidate_caches()
+
+    first = json.loads(client.get("/api/mosques?page_size=3&fields=id,name").data)
+    with app.app_context():
+        db.session.add(Mosque(id=7, name="أ مسجد أول", location="حطين", area="شمال"))  # sorts first
+        db.session.commit()
+        invalidate_caches()
+
+    rest, cursor = [], first["next_cursor"]
+    while cursor:
+        page = json.loads(client.get(f"/api/mosques?page_size=3&fields=id,name&cursor={cursor}").data)
+        rest.extend(page["items"])
+        cursor = page["next_cursor"]
+    listed = [m["id"] for m in first["items"]] + [m["id"] for m in rest]
+    assert sorted(listed) == list(range(1, 7))  # nothing repeated, nothing skipped
+
+
+def test_batch_lookup_keeps_request_order_and_reports_missing(app, client):
+    with app.app_context():
+        db.session.add(Mosque(id=2, name="جامع بلا إمام", location="حطين", area="شمال"))
+        db.session.commit()
+        invalidate_caches()
+
+    data = json.loads(client.get("/api/mosques/batch?ids=2,99,1,2").data)
+    assert [m["id"] for m in data["items"]] == [2, 1]
+    assert data["items"][0]["imam"] is None
+    assert data["items"][1]["imam"] == "الشيخ خالد الجليل"
+    assert data["missing"] == [99]
+
+    assert client.get("/api/mosques/batch?ids=1,abc").status_code == 400
+    assert client.get("/api/mosques/batch").status_code == 400
+
+
+def test_facets_count_mosques_imams_and_audio(app, client):
+    with app.app_context():
+        db.session.add(Mosque(id=2, name="جامع بلا إمام", location="حطين", area="شمال"))
+        db.session.add(Mosque(id=3, name="جامع الصوت", location="العليا", area="وسط"))
+        db.session.add(Imam(id=2, name="إمام بتلاوة", mosque_id=3, audio_sample="https://x/a.mp3"))
+        db.session.commit()
+        invalidate_caches()
+
+    data = json.loads(client.get("/api/facets").data)
+    assert data["total"] == {"mosques": 3, "with_imam": 2, "with_audio": 1}
+    north, center = data["areas"]
+    assert (north["area"], north["mosques"], north["with_imam"]) == ("شمال", 2, 1)
+    assert [loc["location"] for loc in north["locations"]] == ["الملقا", "حطين"]
+    assert center["locations"] == [
+        {"location": "العليا", "mosques": 1, "with_imam": 1, "with_audio": 1}
+    ]
+
+    assert json.loads(client.get("/api/areas").data) == ["شمال", "وسط"]
+    assert json.loads(client.get("/api/locations?area=شمال").data) == ["الملقا", "حطين"]
+    assert json.loads(client.get("/api/locations").data) == ["العليا", "الملقا", "حطين"]
+
+
+def test_catalog_follows_generation_bumped_elsewhere(app, monkeypatch):
+    from services import generation
+
+    with app.app_context():
+        first = get_catalog()
+        # A write committed by another worker: DB changed, this process was not told directly
+        db.session.add(Mosque(id=2, name="جامع جديد", location="حطين", area="شمال"))
+        db.session.commit()
+        assert get_catalog() is first
+
+        monkeypatch.setattr(generation, "_local_generation", generation._local_generation + 1)
+        monkeypatch.setattr(generation, "_checked_at", 0.0)
+        rebuilt = get_catalog()
+        assert rebuilt is not first
+        assert rebuilt.version > first.version
+        assert 2 in rebuilt.mosques
+
+
+def test_catalog_follows_database_stamp_without_redis(app, monkeypatch):
+    from services import generation
+
+    with app.app_context():
+        first = get_catalog()
+        # Another worker's write: no Redis, so no shared counter and no announcement
+        db.session.add(Mosque(id=2, name="جامع جديد", location="حطين", area="شمال"))
+        db.session.commit()
+
+        monkeypatch.setattr(generation, "_checked_at", 0.0)
+        rebuilt = get_catalog()
+        assert rebuilt is not first
+        assert 2 in rebuilt.mosques
+
+        monkeypatch.setattr(generation, "_checked_at", 0.0)
+        assert get_catalog() is rebuilt
+
+
+def test_generation_from_another_source_never_matches(app, monkeypatch):
+    from services import generation
+
+    with app.app_context():
+        first = get_catalog()
+        # Redis comes back with a counter that happens to equal this worker's local one
+        monkeypatch.setattr(generation, "redis_is_available", lambda: True)
+        monkeypatch.setattr(generation, "redis_get", lambda key: generation._local_generation)
+        monkeypatch.setattr(generation, "_checked_at", 0.0)
+        assert get_catalog() is not first
+
+
+def test_commit_without_invalidate_written_still_moves_the_catalog(app):
+    from models import Imam
+    from services.cache import flush_invalidations
+
+    with app.app_context():
+        first = get_catalog()
+        # What a Flask-Admin create does: a plain commit, no invalidate_written()
+        db.session.add(Imam(id=50, name="الشيخ الجديد", mosque_id=None))
+        db.session.commit()
+        flush_invalidations()
+        assert 50 in get_catalog().imams
+
+
+def test_imam_search_does_not_touch_the_database(app, client):
+    from sqlalchemy import event
+
+    client.get("/api/imams/search?q=خالد")  # builds catalog + imam index
+    statements = []
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            resp = client.get("/api/imams/search?q=الجليل")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+    assert json.loads(resp.data)[0]["name"] == "الشيخ خالد الجليل"
+    assert statements == []
+
+
+def test_cursor_pages_stay_out_of_the_shared_cache(client):
+    from services import cache
+    from services.serializers import encode_cursor
+
+    for n in range(5):
+        cursor = encode_cursor(f"مسجد وهمي {n}", n)
+        assert client.get(f"/api/mosques?page_size=2&cursor={cursor}").status_code == 200
+    assert not [key for key in cache._local_cache._data if "+" in key]
@@ -0,0 +1,167 @@
+import gzip
+import json
+
+from models import db, Mosque
+from services.cache import invalidate_caches
+
+
+def test_catalog_endpoints_return_etag_and_304(client):
+    for url in ("/api/mosques", "/api/locations", "/api/areas"):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag
+
+        second = client.get(url)
+        assert second.data == first.data
+        assert second.headers["ETag"] == etag
+
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.data == b""
+
+
+def test_cached_body_matches_jsonify(app, client):
+    resp = client.get("/api/mosques")
+    with app.app_context():
+        assert resp.data == app.json.response(json.loads(resp.data)).data
+
+
+def test_precompressed_variant_matches_identity_body(app, client):
+    with app.app_context():
+        for n in range(2, 20):
+            db.session.add(Mosque(id=n, name=f"مسجد رقم {n}", location="الملقا", area="شمال"))
+        db.session.commit()
+        invalidate_caches()
+
+    plain = client.get("/api/mosques", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+
+    zipped = client.get("/api/mosques", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in zipped.headers["Vary"]
+    assert gzip.decompress(zipped.data) == plain.data
+
+    not_modified = client.get("/api/mosques", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"],
+    })
+    assert not_modified.status_code == 304
+
+
+def test_public_profile_revalidates_until_the_user_writes(app, client):
+    from models import PublicUser, UserFavorite
+    from services.cache_tags import user_tags
+
+    first = client.get("/api/u/tester_a")
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "public, no-cache"
+
+    assert client.get("/api/u/tester_a", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/u/tester_b", headers={"If-None-Match": etag}).status_code == 200
+
+    db.session.add(UserFavorite(user_id=1, mosque_id=1))
+    db.session.commit()
+    invalidate_caches(*user_tags(PublicUser.query.get(1)), catalog=False)
+
+    changed = client.get("/api/u/tester_a", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert [m["id"] for m in changed.json["mosques"]] == [1]
+
+
+def test_private_endpoints_304_without_touching_the_view(app, client, monkeypatch):
+    import auth_utils
+    from blueprints import auth as auth_routes
+
+    verified = []
+
+    def verify_id_token(token, check_revoked=False):
+        verified.append(token)
+        return {"uid": "uid_a"}
+
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", verify_id_token)
+    headers = {"Authorization": "Bearer token-a"}
+
+    first = client.get("/api/user/tracker", headers=headers)
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    assert "Authorization" in first.headers["Vary"]
+    assert verified == ["token-a"]  # the ETag check and the auth decorator share one verification
+
+    # Another user's token never matches this user's ETag
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", lambda t, check_revoked=False: {"uid": "uid_b"})
+    other = client.get("/api/user/tracker", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != first.headers["ETag"]
+
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", verify_id_token)
+    monkeypatch.setattr(auth_routes.TaraweehAttendance, "query", None)  # the view must not run
+    not_modified = client.get("/api/user/tracker", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert "Authorization" in not_modified.headers["Vary"]
+
+
+def test_leaderboard_revalidates_after_an_approval(app, client, monkeypatch):
+    import auth_utils
+    from models import CommunityRequest, PublicUser
+    from services.cache import flush_invalidations
+    from services.cache_tags import committed_tags
+
+    reader = app.test_client()  # no read-your-writes cookie
+    first = reader.get("/api/leaderboard")
+    assert "tester_zero" not in [e["username"] for e in first.json]
+
+    PublicUser.query.get(2).role = "admin"
+    db.session.add(CommunityRequest(
+        id=1, submitter_id=3, request_type="new_imam", target_mosque_id=1, imam_name="الشيخ ماهر",
+    ))
+    db.session.commit()
+    committed_tags()  # setup writes are not part of what the approval touches
+    flush_invalidations()
+    etag = reader.get("/api/leaderboard").headers["ETag"]
+
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(
+        auth_utils.firebase_auth, "verify_id_token", lambda t, check_revoked=False: {"uid": "uid_b"}
+    )
+    approved = client.post("/api/admin/requests/1/approve", json={}, headers={"Authorization": "Bearer admin"})
+    assert approved.status_code == 200
+    flush_invalidations()
+
+    revalidated = reader.get("/api/leaderboard", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 200
+    assert "tester_zero" in [e["username"] for e in revalidated.json]
+    profile = reader.get("/api/u/tester_zero")
+    assert profile.json["contribution_points"] == 1
+
+
+def test_favorites_revalidate_after_their_mosque_is_deleted(app, client, monkeypatch):
+    import auth_utils
+    from models import Mosque, PublicUser, UserFavorite
+    from services.cache import flush_invalidations
+    from services.cache_tags import committed_tags
+
+    PublicUser.query.get(2).role = "admin"
+    db.session.add(Mosque(id=2, name="جامع الجنوب", location="الشفا", area="جنوب"))
+    db.session.add(UserFavorite(user_id=1, mosque_id=2))
+    db.session.commit()
+    committed_tags()
+    flush_invalidations()
+
+    tokens = {"Bearer reader": "uid_a", "Bearer admin": "uid_b"}
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(
+        auth_utils.firebase_auth, "verify_id_token", lambda t, check_revoked=False: {"uid": tokens[f"Bearer {t}"]}
+    )
+    reader = {"Authorization": "Bearer reader"}
+    first = client.get("/api/user/favorites", headers=reader)
+    assert first.json == [2]
+
+    deleted = app.test_client().delete("/api/admin/mosques/2", headers={"Authorization": "Bearer admin"})
+    assert deleted.status_code == 200
+    flush_invalidations()
+
+    revalidated = client.get("/api/user/favorites", headers={**reader, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 200
+    assert revalidated.json == []
@@ -0,0 +1,29 @@
+import json
+
+from models import db, Mosque
+from services import cache, invalidation
+from services.cache_tags import tag_versions
+from services.catalog import get_catalog
+
+
+def test_announced_generation_drops_local_caches_and_snapshot(app, client):
+    assert len(json.loads(client.get("/api/mosques").data)) == 1
+    assert cache._namespaced("mosques") in cache._local_cache
+    first = get_catalog()
+
+    # Another worker commits a write and announces the new generation
+    db.session.add(Mosque(id=2, name="جامع جديد", location="حطين", area="شمال"))
+    db.session.commit()
+    mosques_version = tag_versions(["mosques"])["mosques"]
+    invalidation._apply_message({"generation": "redis:100", "tags": {"mosques": mosques_version + 1}})
+
+    assert get_catalog() is not first
+    assert len(json.loads(client.get("/api/mosques").data)) == 2
+
+
+def test_own_announcement_is_not_applied_twice(app, client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(invalidation, "_handlers", [lambda: calls.append(1)])
+    cache.invalidate_caches()
+    invalidation._apply(get_catalog().generation)
+    assert calls == []
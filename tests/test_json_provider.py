@@ -0,0 +1,31 @@
+import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+
+def _stdlib_provider(app):
+    provider = DefaultJSONProvider(app)
+    provider.ensure_ascii = False
+    return provider
+
+
+def test_responses_match_the_stdlib_encoder_byte_for_byte(app):
+    payload = {
+        "mosques": [
+            {"id": 1, "name": "جامع الراجحي", "latitude": 24.7136, "imam": None, "audio": True},
+            {"id": 2, "name": "مسجد \"النور\"\n", "latitude": -0.0, "imam": "الشيخ", "audio": False},
+        ],
+        "updated": datetime.datetime(2025, 3, 1, 12, 30),
+        "day": datetime.date(2025, 3, 1),
+        "total": 2,
+    }
+    expected = _stdlib_provider(app).response(payload).get_data()
+    assert app.json.response(payload).get_data() == expected
+    assert app.json.dumps(payload) == _stdlib_provider(app).dumps(payload)
+    assert "جامع".encode("utf-8") in expected
+
+
+def test_api_routes_use_the_fast_provider(client):
+    resp = client.get("/api/mosques")
+    assert "جامع الراجحي".encode("utf-8") in resp.data
+    assert resp.data.endswith(b"\n")
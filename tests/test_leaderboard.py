@@ -1,6 +1,7 @@
 import json
 
 from models import db, PublicUser
+from services.leaderboard import award_points
 
 
 def test_atomic_contribution_points_increment(app):
@@ -32,3 +33,55 @@ def test_leaderboard_excludes_zero_point_users(client):
     data = json.loads(resp.data)
     usernames = [entry["username"] for entry in data]
     assert "tester_zero" not in usernames
+
+
+def test_award_points_updates_mirrored_board(client):
+    client.get("/api/leaderboard")  # mirror the board from the DB
+    with client.application.app_context():
+        user = PublicUser.query.get(2)
+        user.contribution_points = PublicUser.contribution_points + 3
+        db.session.commit()
+    award_points(2, 3)
+
+    data = json.loads(client.get("/api/leaderboard").data)
+    assert [(e["username"], e["points"]) for e in data] == [("tester_b", 6), ("tester_a", 5)]
+
+
+def test_leaderboard_pagination_and_season(client):
+    data = json.loads(client.get("/api/leaderboard?per_page=1&page=2").data)
+    assert [e["username"] for e in data] == ["tester_b"]
+
+    data = json.loads(client.get("/api/leaderboard?season=current").data)
+    assert data == []
+    assert client.get("/api/leaderboard?season=abc").status_code == 400
+
+
+def test_local_board_picks_up_other_workers_approvals(client, monkeypatch):
+    from services import leaderboard
+
+    client.get("/api/leaderboard")  # this worker mirrors the board (no Redis here)
+    with client.application.app_context():
+        # Another worker's approval: the DB moves, this worker's board is not told
+        PublicUser.query.get(2).contribution_points = PublicUser.contribution_points + 3
+        db.session.commit()
+    assert json.loads(client.get("/api/leaderboard").data)[0]["username"] == "tester_a"
+
+    # LOCAL_RESEED_TTL later
+    monkeypatch.setattr(leaderboard, "_local_seeded_until", dict.fromkeys(leaderboard._local_seeded_until, 0))
+    data = json.loads(client.get("/api/leaderboard").data)
+    assert [(e["username"], e["points"]) for e in data] == [("tester_b", 6), ("tester_a", 5)]
+
+
+def test_leaderboard_me_keeps_ranks_when_a_neighbour_is_gone(client, monkeypatch):
+    import auth_utils
+
+    client.get("/api/leaderboard")  # mirror the board, tester_a first
+    with client.application.app_context():
+        db.session.delete(PublicUser.query.get(1))  # still on the mirrored board until the reseed
+        db.session.commit()
+
+    monkeypatch.setattr(auth_utils, "firebase_app", object())
+    monkeypatch.setattr(auth_utils.firebase_auth, "verify_id_token", lambda t, check_revoked=False: {"uid": "uid_b"})
+    data = client.get("/api/leaderboard/me", headers={"Authorization": "Bearer token"}).json
+    assert data["rank"] == 2
+    assert [(e["username"], e["rank"]) for e in data["neighbours"]] == [("tester_b", 2)]
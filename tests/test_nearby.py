@@ -0,0 +1,61 @@
+import json
+
+from geopy.distance import geodesic
+
+from models import db, Imam, Mosque
+from services.cache import invalidate_caches
+
+USER = (24.7136, 46.6753)
+
+COORDS = [
+    (24.80, 46.60, "شمال"),
+    (24.72, 46.68, "شمال"),
+    (24.60, 46.75, "جنوب"),
+    (24.71, 46.80, "شرق"),
+    (24.69, 46.55, "غرب"),
+    (24.90, 46.70, "شمال"),
+]
+
+
+def _seed_coords(app):
+    with app.app_context():
+        for n, (lat, lng, area) in enumerate(COORDS, start=10):
+            db.session.add(Mosque(id=n, name=f"مسجد {n}", location="حي", area=area, latitude=lat, longitude=lng))
+        db.session.add(Imam(id=10, name="إمام", mosque_id=11, audio_sample="https://example.com/a.mp3"))
+        db.session.commit()
+        invalidate_caches()
+
+
+def _expected_order():
+    dists = [
+        (round(geodesic(USER, (lat, lng)).kilometers, 2), n)
+        for n, (lat, lng, _) in enumerate(COORDS, start=10)
+    ]
+    return [n for _, n in sorted(dists)]
+
+
+def test_nearby_matches_exact_geodesic_order(app, client):
+    _seed_coords(app)
+    resp = client.get(f"/api/mosques/nearby?lat={USER[0]}&lng={USER[1]}")
+    data = json.loads(resp.data)
+    assert [m["id"] for m in data] == _expected_order()
+    assert data[0]["distance"] <= data[-1]["distance"]
+
+
+def test_nearby_limit_radius_and_filters(app, client):
+    _seed_coords(app)
+    base = f"/api/mosques/nearby?lat={USER[0]}&lng={USER[1]}"
+
+    data = json.loads(client.get(base + "&limit=3").data)
+    assert [m["id"] for m in data] == _expected_order()[:3]
+
+    data = json.loads(client.get(base + "&radius_km=15").data)
+    assert data and all(m["distance"] <= 15 for m in data)
+
+    data = json.loads(client.get(base + "&area=شمال").data)
+    assert {m["area"] for m in data} == {"شمال"}
+
+    data = json.loads(client.get(base + "&has_audio=1").data)
+    assert [m["id"] for m in data] == [11]
+
+    assert client.get(base + "&limit=0").status_code == 400
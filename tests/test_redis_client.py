@@ -0,0 +1,78 @@
+import pytest
+
+from services import redis_client
+
+
+class FlakyRedis:
+    def __init__(self):
+        self.up = True
+        self.calls = 0
+
+    def _maybe_fail(self):
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError("redis down")
+
+    def get(self, key):
+        self._maybe_fail()
+        return '"cached"'
+
+    def ping(self):
+        self._maybe_fail()
+        return True
+
+
+@pytest.fixture()
+def flaky(monkeypatch):
+    fake = FlakyRedis()
+    monkeypatch.setattr(redis_client, "_redis_client", fake)
+    monkeypatch.setattr(redis_client, "_init_attempted", True)
+    monkeypatch.setattr(redis_client, "_start_reconnector", lambda: None)
+    redis_client._close_breaker()
+    yield fake
+    with redis_client._breaker_lock:
+        redis_client._state = redis_client.DISABLED
+        redis_client._failures = 0
+
+
+def test_breaker_opens_after_consecutive_failures_and_short_circuits(flaky):
+    assert redis_client.redis_get("k") == "cached"
+    flaky.up = False
+    for _ in range(redis_client.FAILURE_THRESHOLD):
+        assert redis_client.redis_get("k") is None
+    assert redis_client.redis_breaker_state()["state"] == redis_client.OPEN
+    assert not redis_client.redis_is_available()
+
+    calls = flaky.calls
+    for _ in range(100):
+        assert redis_client.redis_get("k") is None
+    assert flaky.calls == calls  # never touched the socket while open
+    assert redis_client.redis_breaker_state()["short_circuited"] >= 100
+
+
+def test_half_open_probe_closes_or_reopens_the_breaker(flaky):
+    flaky.up = False
+    for _ in range(redis_client.FAILURE_THRESHOLD):
+        redis_client.redis_get("k")
+
+    assert redis_client._probe() is False
+    assert redis_client.redis_breaker_state()["state"] == redis_client.OPEN
+
+    flaky.up = True
+    assert redis_client._probe() is True
+    assert redis_client.redis_breaker_state()["state"] == redis_client.CLOSED
+    assert redis_client.redis_get("k") == "cached"
+
+
+def test_codec_round_trips_compact_utf8():
+    value = {"name": "جامع الراجحي", "ids": [1, 2], "ok": True}
+    data = redis_client.encode_value(value)
+    assert data == '{"name":"جامع الراجحي","ids":[1,2],"ok":true}'.encode("utf-8")
+    assert redis_client.decode_value(data) == value
+    assert redis_client.decode_value(b"not json") is None
+
+
+def test_batch_helpers_fall_back_without_redis():
+    assert redis_client.redis_mget(["a", "b"]) == [None, None]
+    assert redis_client.redis_mget([]) == []
+    assert redis_client.redis_pipeline(("get", "a")) is None
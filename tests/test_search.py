@@ -0,0 +1,127 @@
+import json
+import re
+
+from models import db, Imam, Mosque
+from services.cache import invalidate_caches, search_result_cache
+from utils import normalize_arabic, normalize_arabic_many
+
+MOSQUES = [
+    (2, "جامع الأميرة سارة", "حطين", "شمال", "عبدالرحمن السديس"),
+    (3, "مسجد الإمام تركي", "النخيل", "شمال", None),
+    (4, "جامع قرطبة", "قرطبة", "شرق", "ماهر المعيقلي"),
+    (5, "مسجد الحيّ", "الملقا", "شمال", "خالد الجليل"),
+    (6, "جامع العليا الكبير", "العليا", "غرب", "ياسر الدوسري"),
+]
+
+QUERIES = ["الراجحي", "الجليل", "خالد", "السديس", "المعيقلي", "عبدالرحمن", "الملقا",
+           "حطين", "النخيل", "قرطبة", "جا", "ا", "أميره", "جامع ال", "  ", "غير موجود"]
+
+
+def _seed(app):
+    with app.app_context():
+        for mid, name, location, area, imam in MOSQUES:
+            db.session.add(Mosque(id=mid, name=name, location=location, area=area))
+            if imam:
+                db.session.add(Imam(id=mid, name=imam, mosque_id=mid))
+        db.session.commit()
+        invalidate_caches()
+
+
+def _brute_force(pairs, query):
+    """The pre-index search_mosques predicate."""
+    normalized_query = normalize_arabic(query)
+    out = []
+    for mosque, imam in pairs:
+        imam_name = imam.name if imam else ""
+        if (
+            query.lower() in mosque.name.lower()
+            or query.lower() in mosque.location.lower()
+            or query.lower() in imam_name.lower()
+            or normalized_query in normalize_arabic(mosque.name)
+            or normalized_query in normalize_arabic(mosque.location)
+            or (imam_name and normalized_query in normalize_arabic(imam_name))
+        ):
+            out.append(mosque.id)
+    return out
+
+
+def test_search_index_matches_linear_scan(app, client):
+    _seed(app)
+    with app.app_context():
+        pairs = (
+            db.session.query(Mosque, Imam)
+            .outerjoin(Imam, Imam.mosque_id == Mosque.id)
+            .order_by(Mosque.name)
+            .all()
+        )
+        for q in QUERIES:
+            resp = client.get("/api/mosques/search", query_string={"q": q})
+            assert [m["id"] for m in json.loads(resp.data)] == _brute_force(pairs, q), q
+
+
+def test_search_index_area_and_location_filters(app, client):
+    _seed(app)
+    resp = client.get("/api/mosques/search", query_string={"q": "جامع", "area": "شمال"})
+    assert sorted(m["id"] for m in json.loads(resp.data)) == [1, 2]
+
+    resp = client.get("/api/mosques/search", query_string={"area": "شمال", "location": "الملقا"})
+    assert sorted(m["id"] for m in json.loads(resp.data)) == [1, 5]
+
+
+def test_search_results_are_cached_per_normalized_query(app, client):
+    _seed(app)
+    first = client.get("/api/mosques/search", query_string={"q": "أميرة"})
+    hits = search_result_cache.hits
+    second = client.get("/api/mosques/search", query_string={"q": "اميره"})
+    assert search_result_cache.hits == hits + 1
+    assert second.data == first.data
+
+    with app.app_context():
+        Mosque.query.get(2).name = "جامع آخر"
+        db.session.commit()
+        invalidate_caches()
+    third = client.get("/api/mosques/search", query_string={"q": "أميرة"})
+    assert json.loads(third.data) == []
+
+
+def _regex_normalize(text):
+    """The original five-pass normalizer, kept as the reference for the translate table."""
+    if not text:
+        return ""
+    text = str(text)
+    text = re.sub('[إأآا]', 'ا', text)
+    text = re.sub('[يى]', 'ي', text)
+    text = re.sub('ة', 'ه', text)
+    text = re.sub('[\u064B-\u0652]', '', text)
+    text = re.sub('\u0640', '', text)
+    return ' '.join(text.split()).lower()
+
+
+def test_normalize_arabic_matches_regex_reference():
+    samples = [
+        None, "", "  ", "مُحَمَّدٌ", "إبراهيم  أحمد\tآل", "مستشفى", "جامعة", "الـــشيخ",
+        "Masjid AL-Rajhi", "٣ مساجد", "\u064b\u0652\u0653", *[m[1] for m in MOSQUES],
+    ]
+    expected = [_regex_normalize(s) for s in samples]
+    assert [normalize_arabic(s) for s in samples] == expected
+    assert normalize_arabic_many(samples) == expected
+    assert normalize_arabic_many(["a\x00b", "ى"]) == ["a\x00b", "ي"]
+    assert normalize_arabic("٣٤ ۵", fold_digits=True) == "34 5"
+
+
+def test_rank_imams_matches_reference_scorer(app):
+    from services.search import compile_query, get_imam_index, rank_imams, score_imam
+
+    with app.app_context():
+        for n, name in enumerate(["الشيخ خالد القحطاني", "خالد الغامدي", "الإمام ماهر المعيقلي",
+                                  "ياسر الدوسري", "عبدالله خياط"], start=10):
+            db.session.add(Imam(id=n, name=name))
+        db.session.commit()
+        invalidate_caches()
+        index = get_imam_index()
+        for q in ["خالد", "الشيخ خالد", "المعيقلي", "معيقلى", "خالد القحطاني", "دوسر", "خياط عبدالله"]:
+            query = compile_query(normalize_arabic(q))
+            args = (query['norm'], query['stripped'], query['words'], query['stripped_words'])
+            scored = [(score_imam(*args, e), e) for e in index]
+            expected = [e['imam'].id for s, e in sorted(scored, key=lambda x: -x[0]) if s > 0][:15]
+            assert [e['imam'].id for e in rank_imams(index, query)] == expected
@@ -0,0 +1,44 @@
+from xml.etree import ElementTree
+
+from models import db, Mosque
+from services import sitemap
+from services.cache import invalidate_caches
+
+NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+
+def test_sitemap_lists_static_pages_and_mosques(client):
+    resp = client.get("/sitemap.xml")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/xml"
+    root = ElementTree.fromstring(resp.data)
+    assert root.tag == "{%s}urlset" % NS["sm"]
+    locs = [e.text for e in root.findall("sm:url/sm:loc", NS)]
+    assert locs[:len(sitemap.STATIC_PATHS)] == [sitemap.SITE_URL + p for p in sitemap.STATIC_PATHS]
+    assert locs[len(sitemap.STATIC_PATHS):] == [f"{sitemap.SITE_URL}/mosque/1"]
+    assert all(e.text for e in root.findall("sm:url/sm:lastmod", NS))
+
+    again = client.get("/sitemap.xml", headers={"If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_sitemap_shards_past_shard_size(app, client, monkeypatch):
+    monkeypatch.setattr(sitemap, "SHARD_SIZE", 5)
+    with app.app_context():
+        for n in range(2, 8):
+            db.session.add(Mosque(id=n, name=f"مسجد رقم {n}", location="الملقا", area="شمال"))
+        db.session.commit()
+        invalidate_caches()
+
+    index = ElementTree.fromstring(client.get("/sitemap.xml").data)
+    assert index.tag == "{%s}sitemapindex" % NS["sm"]
+    shards = [e.text for e in index.findall("sm:sitemap/sm:loc", NS)]
+    assert shards == [f"{sitemap.SITE_URL}/sitemap-{n}.xml" for n in (1, 2, 3, 4)]
+
+    locs = []
+    for n in (1, 2, 3, 4):
+        resp = client.get(f"/sitemap-{n}.xml")
+        assert resp.status_code == 200
+        locs += [e.text for e in ElementTree.fromstring(resp.data).findall("sm:url/sm:loc", NS)]
+    assert len(locs) == len(sitemap.STATIC_PATHS) + 7
+    assert client.get("/sitemap-5.xml").status_code == 404
@@ -1,32 +1,51 @@
-import re
+from functools import lru_cache
 
-def normalize_arabic(text):
-    """
-    normalizing Arabic text to standardize different forms of letters,
-    remove tashkeel, and handle spacing for improved search.
-    """
-    if not text:
-        return ""
+# Every single-character rewrite normalize_arabic does, as one str.translate table:
+# alif forms -> ا, alif maqsura -> ي, taa marbuta -> ه, tashkeel and tatweel removed.
+_ARABIC_TABLE = str.maketrans({
+    "إ": "ا", "أ": "ا", "آ": "ا",
+    "ى": "ي",
+    "ة": "ه",
+    **{chr(c): None for c in range(0x064B, 0x0653)},  # tashkeel (fathatan .. sukun)
+    "ـ": None,  # tatweel
+})
+
+# Optional extra fold: Arabic-Indic and Eastern Arabic-Indic digits -> ASCII digits
+_DIGITS_TABLE = str.maketrans({
+    **{chr(0x0660 + d): str(d) for d in range(10)},
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+_ARABIC_DIGITS_TABLE = {**_ARABIC_TABLE, **_DIGITS_TABLE}
 
-    # converting to string
-    text = str(text)
+NORMALIZE_CACHE_SIZE = 16384  # comfortably holds every mosque, location and imam name
 
-    # replace various forms of Alif
-    text = re.sub('[إأآا]', 'ا', text)
+# Separator for batch translation; untouched by both tables and never whitespace
+_BATCH_SEP = "\x00"
 
-    # replace various forms of Yaa
-    text = re.sub('[يى]', 'ي', text)
 
-    # replace Taa Marbuth with Ha
-    text = re.sub('ة', 'ه', text)
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(text, fold_digits):
+    table = _ARABIC_DIGITS_TABLE if fold_digits else _ARABIC_TABLE
+    return " ".join(text.translate(table).split()).lower()
 
-    # remove Tashkeel
-    text = re.sub('[\u064B-\u0652]', '', text)
 
-    # Remove Tatweel
-    text = re.sub('\u0640', '', text)
+def normalize_arabic(text, fold_digits=False):
+    """
+    normalizing Arabic text to standardize different forms of letters,
+    remove tashkeel, and handle spacing for improved search.
+
+    With fold_digits=True, Arabic-Indic digits are also mapped to 0-9.
+    """
+    if not text:
+        return ""
+    return _normalize(str(text), fold_digits)
 
-    # standardize the spacing
-    text = ' '.join(text.split())
 
-    return text.lower()  # Convert to lowercase for case-insensitivity
\ No newline at end of file
+def normalize_arabic_many(texts, fold_digits=False):
+    """normalize_arabic over a whole column of strings, translating them in one pass."""
+    texts = ["" if not t else str(t) for t in texts]
+    table = _ARABIC_DIGITS_TABLE if fold_digits else _ARABIC_TABLE
+    translated = _BATCH_SEP.join(texts).translate(table).split(_BATCH_SEP)
+    if len(translated) != len(texts):  # a value contained the separator itself
+        return [normalize_arabic(t, fold_digits) for t in texts]
+    return [" ".join(t.split()).lower() for t in translated]